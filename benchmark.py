@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+import pandas as pd
+from ingest import SmartDataManager, load_dir
+import numpy as np
+from scheduler import CSPScheduler, ENGINES, TimeGrid, DEFAULT_GRID, DAYS, TIMES, LUNCH_SLOT_INDEX, HOMEROOM_DAY, HOMEROOM_SLOT, ACTIVITY_DAY, ACTIVITY_SLOTS
+from reports import ReportGenerator, build_grid
+from gen_data import generate, SIZE_TIERS
+from occupancy import OCCUPANCY_BACKENDS, slots_mask
+
+# ==========================================
+# BENCHMARK: Occupancy backends (check / solve)
+# ==========================================
+# ใช้ไฟล์ที่ได้จาก gen_data.py (teach.csv / register.csv / subject.csv)
+DEFAULT_DATA = os.path.join(os.path.expanduser("~"), "Desktop", "Generated_CSV_Files")
+
+def load_register(data_dir, fold_groups=0):
+    df, _ = load_dir(data_dir, ['teach.csv', 'register.csv', 'subject.csv'])
+    # fold_groups > 0: บีบให้เหลือ N กลุ่ม เพื่อจำลองโรงเรียนที่ตารางแน่น (มี fallback/ตกหล่นจริง)
+    if fold_groups: df['Group'] = [f"G{i % fold_groups}" for i in range(len(df))]
+    return df
+
+def assign_rooms(df, rooms_df, n_fixed=10):
+    # ห้องจริง: 1/3 ระบุห้องตายตัว (วน n_fixed ห้อง -> แย่งห้องกัน), 1/3 ระบุแค่ประเภทห้อง, ที่เหลือไม่ใช้ห้อง
+    df = df.copy(); n = len(df)
+    fixed = rooms_df['Room'].tolist()[:n_fixed]; types = sorted(rooms_df['Room Type'].unique())
+    df['Room'] = [fixed[i % len(fixed)] if i % 3 == 0 else '-' for i in range(n)]
+    df['Room Type'] = [types[i % len(types)] if i % 3 == 1 else None for i in range(n)]
+    return df
+
+# ==========================================
+# BASELINE: engine เดิมก่อนใช้ bitset (numpy ช่องละ 1 ตัว + วนเช็คทีละ slot) -- ใช้เป็นตัวอ้างอิงของ speedup เท่านั้น
+# ==========================================
+class BaselineScheduler:
+    """The original per-slot numpy scheduler (same placements as the pre-bitset engine), the reference the backends are measured against."""
+    grid = DEFAULT_GRID
+
+    def __init__(self, register_df):
+        self.reg_df = register_df.copy()
+        self.reg_df['Hours'] = pd.to_numeric(self.reg_df['Credits'], errors='coerce').fillna(2).astype(int)
+        self.teachers = self.reg_df['Teacher ID'].unique()
+        self.groups = self.reg_df['Group'].unique()
+        self.t_sched = {t: np.zeros(65, dtype=int) for t in self.teachers}
+        self.g_sched = {g: np.zeros(65, dtype=int) for g in self.groups}
+        self.group_daily_load = {g: np.zeros(5, dtype=int) for g in self.groups}
+        self.teacher_load_realtime = self.reg_df.groupby('Teacher ID', observed=True)['Hours'].sum().to_dict()
+        self.subject_teachers_map = self.reg_df.groupby('Subject ID', observed=True)['Teacher ID'].unique().to_dict()
+        self.assignments = []; self.failed = []
+
+    def check(self, tid, gid, slots, allow_lunch=False):
+        for s in slots:
+            day = s // 13; period = s % 13
+            if day == ACTIVITY_DAY and period in ACTIVITY_SLOTS: return False
+            if day == HOMEROOM_DAY and period == HOMEROOM_SLOT: return False
+            if not allow_lunch and period == LUNCH_SLOT_INDEX: return False
+        if tid not in self.t_sched: self.t_sched[tid] = np.zeros(65, dtype=int)
+        if not all(self.t_sched[tid][s] == 0 for s in slots): return False
+        if not all(self.g_sched[gid][s] == 0 for s in slots): return False
+        return True
+
+    def book(self, task, slots, actual_tid=None, suffix="", is_extra=False):
+        tid = actual_tid if actual_tid else task['Teacher ID']; gid = task['Group']
+        if tid not in self.t_sched: self.t_sched[tid] = np.zeros(65, dtype=int)
+        self.t_sched[tid][slots] = 1; self.g_sched[gid][slots] = 1
+        day = slots[0] // 13; period = slots[0] % 13
+        self.group_daily_load[gid][day] += len(slots)
+        self.teacher_load_realtime[tid] = self.teacher_load_realtime.get(tid, 0) + len(slots)
+        self.assignments.append({'Day': DAYS[day], 'Period': period, 'Time': TIMES[period],
+                                 'Subject Name': str(task.get('Subject Name', '?')) + suffix, 'Teacher ID': tid, 'Group': gid,
+                                 'Room': task.get('Room', '-'), 'Duration': len(slots),
+                                 'IsSub': bool(actual_tid and actual_tid != task['Teacher ID']), 'IsExtra': is_extra})
+
+    def apply_constraints(self):
+        blocked = [d * 13 + LUNCH_SLOT_INDEX for d in range(5)] + [HOMEROOM_DAY * 13 + HOMEROOM_SLOT] + [ACTIVITY_DAY * 13 + s for s in ACTIVITY_SLOTS]
+        for idx in blocked:
+            for t in self.t_sched: self.t_sched[t][idx] = 1
+            for g in self.g_sched: self.g_sched[g][idx] = 1
+
+    def find_substitute(self, subject_id, original_tid):
+        candidates = [t for t in self.subject_teachers_map.get(subject_id, []) if t != original_tid]
+        candidates.sort(key=lambda t: self.teacher_load_realtime.get(t, 0))
+        return candidates
+
+    def try_allocate(self, task, tid, gid, dur, allow_split=True, allow_lunch=False, max_period=12):
+        days_sorted = sorted(range(5), key=lambda d: self.group_daily_load[gid][d])
+        for day in days_sorted:
+            for p in range(max_period - dur + 1):
+                slots = range(day * 13 + p, day * 13 + p + dur)
+                if self.check(tid, gid, slots, allow_lunch): return slots, None
+        if allow_split and dur > 2:
+            half = dur // 2; rem = dur - half; s1 = None; s2 = None
+            for d1 in days_sorted:
+                for p in range(max_period - half + 1):
+                    sl = range(d1 * 13 + p, d1 * 13 + p + half)
+                    if self.check(tid, gid, sl, allow_lunch): s1 = sl; break
+                if s1: break
+            if s1:
+                if tid not in self.t_sched: self.t_sched[tid] = np.zeros(65, dtype=int)
+                t_orig = self.t_sched[tid][s1].copy(); g_orig = self.g_sched[gid][s1].copy()
+                self.t_sched[tid][s1] = 1; self.g_sched[gid][s1] = 1
+                for d2 in days_sorted:
+                    for p in range(max_period - rem + 1):
+                        sl = range(d2 * 13 + p, d2 * 13 + p + rem)
+                        if self.check(tid, gid, sl, allow_lunch): s2 = sl; break
+                    if s2: break
+                self.t_sched[tid][s1] = t_orig; self.g_sched[gid][s1] = g_orig
+                if s2: return s1, s2
+        return None, None
+
+    def analyze_failure(self, task):
+        tid, gid = task['Teacher ID'], task['Group']
+        t_free = 65 - np.sum(self.t_sched[tid]) if tid in self.t_sched else 65
+        g_free = 65 - np.sum(self.g_sched[gid])
+        if t_free < task['Hours']: return f"Teacher Full (Free {t_free})"
+        elif g_free < task['Hours']: return f"Group Full (Free {g_free})"
+        return "Time Conflict"
+
+    def place(self, task, tid, suffix, is_extra, **kw):
+        s1, s2 = self.try_allocate(task, tid, task['Group'], task['Hours'], **kw)
+        if not (s1 or s2): return False
+        actual = tid if tid != task['Teacher ID'] else None
+        if s1 and not s2: self.book(task, s1, actual, suffix, is_extra)
+        else: self.book(task, s1, actual, suffix + ("(1)" if suffix else " (1)"), is_extra); self.book(task, s2, actual, suffix + ("(2)" if suffix else " (2)"), is_extra)
+        return True
+
+    def solve(self):
+        self.apply_constraints()
+        tasks = self.reg_df.to_dict('records')
+        group_load_map = self.reg_df.groupby('Group', observed=True)['Hours'].sum().to_dict()
+        tasks.sort(key=lambda x: (self.teacher_load_realtime.get(x['Teacher ID'], 0), group_load_map.get(x['Group'], 0), x['Hours']), reverse=True)
+        for task in tasks:
+            org_tid, gid, dur = task['Teacher ID'], task['Group'], task['Hours']
+            if self.place(task, org_tid, "", False): continue
+            if any(self.place(task, t, f" (แทน {t})", False) for t in self.find_substitute(task['Subject ID'], org_tid)): continue
+            # Liquid fill: ช่องเดี่ยวที่ว่างตามลำดับวัน/คาบ
+            free = [s for s in range(65) if self.check(org_tid, gid, [s])][:dur]
+            if len(free) == dur:
+                for idx, s in enumerate(free): self.book(task, [s], suffix=f"({idx+1}/{dur})", is_extra=True)
+                continue
+            if self.place(task, org_tid, " (พิเศษ)", True, allow_lunch=True, max_period=13): continue
+            if any(self.place(task, t, f" (แทน {t} พิเศษ)", True, allow_lunch=True, max_period=13) for t in self.find_substitute(task['Subject ID'], org_tid)): continue
+            task['Reason'] = self.analyze_failure(task); self.failed.append(task)
+        return pd.DataFrame(self.assignments), self.failed
+
+def make_scheduler(df, backend, grid=None):
+    return BaselineScheduler(df) if backend == 'baseline' else CSPScheduler(df, backend=backend, grid=grid)
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter(); out = fn(); dt = time.perf_counter() - t
+        best = dt if best is None or dt < best else best
+    return best, out
+
+def slot_check(sch):
+    # check(ครู, กลุ่ม, ช่อง): baseline วนทีละช่อง, backend ใหม่แปลงช่องเป็น mask แล้ว AND ครั้งเดียว
+    if isinstance(sch, BaselineScheduler): return sch.check
+    return lambda tid, gid, slots: sch.check_mask(tid, gid, slots_mask(slots))
+
+def bench_check(df, backend, n=200000, seed=0, grid=None):
+    sch = make_scheduler(df, backend, grid); sch.apply_constraints(); g = sch.grid; check = slot_check(sch)
+    rng = random.Random(seed)
+    tids = list(sch.teachers); gids = list(sch.groups)
+    probes = [(rng.choice(tids), rng.choice(gids), rng.randrange(g.n_days) * g.ppd + rng.randrange(g.regular_periods - 2), rng.randint(1, 3)) for _ in range(n)]
+    def run():
+        for tid, gid, start, dur in probes: check(tid, gid, range(start, start + dur))
+    return best_of(run, 1)[0] / n * 1e6
+
+def bench_allocate(df, backend, n=50000, seed=0, grid=None):
+    # try_allocate บนตารางที่จัดเสร็จแล้ว (ช่องว่างน้อย = กรณีค้นหานานที่สุด)
+    sch = make_scheduler(df, backend, grid); sch.solve()
+    rng = random.Random(seed)
+    tids = list(sch.teachers); gids = list(sch.groups)
+    probes = [(rng.choice(tids), rng.choice(gids), rng.randint(1, 6)) for _ in range(n)]
+    def run():
+        for tid, gid, dur in probes: sch.try_allocate(None, tid, gid, dur, allow_lunch=True, max_period=sch.grid.ppd)
+    return best_of(run, 1)[0] / n * 1e6
+
+def bench_pdf(df, workers=None):
+    # Export PDF ทั้งหมด: serial เทียบกับ process pool (ผลต้องเหมือนกันทุกหน้า)
+    res, _ = CSPScheduler(df).solve()
+    res['Teacher ID'] = res['Teacher ID'].astype(str); res['Group'] = res['Group'].astype(str)
+    rg = ReportGenerator()
+    serial_s, a = best_of(lambda: rg.export_all_pdfs(res), 1)
+    parallel_s, b = best_of(lambda: rg.export_all_pdfs_parallel(res, workers=workers), 1)
+    strip = lambda x: re.sub(rb'/CreationDate \([^)]*\)', b'', x)
+    return {'pages': len(rg.page_jobs(res)), 'serial_s': round(serial_s, 2), 'parallel_s': round(parallel_s, 2),
+            'workers': workers or os.cpu_count(), 'speedup': round(serial_s / parallel_s, 2), 'identical': strip(a) == strip(b)}
+
+# ==========================================
+# BENCHMARK SUITE: gen_data tiers -> ingest / merge / solve / grid / export
+# ==========================================
+# แต่ละรอบเขียน 1 บรรทัด JSON (ต่อท้ายไฟล์) พร้อม commit/เวอร์ชัน เพื่อเทียบ regression ข้ามเวอร์ชัน
+SUITE_FILES = ['teach.csv', 'register.csv', 'subject.csv', 'room.csv']
+SUITE_STAGES = ['process_file', 'smart_merge', 'solve', 'build_grid', 'export_excel', 'export_all_pdfs']
+
+def git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError): return None
+
+def bench_tier(tier, seed, gen_dir, repeat=1, skip=()):
+    data_dir = os.path.join(gen_dir, f"{tier}-seed{seed}")
+    if not os.path.exists(os.path.join(data_dir, 'teach.csv')): generate(data_dir, seed=seed, scale=SIZE_TIERS[tier], verbose=False)
+    t = {}
+    def read_all():
+        dm = SmartDataManager(); dfs = []
+        for name in SUITE_FILES:
+            with open(os.path.join(data_dir, name), 'rb') as f: dfs.append(dm.process_file(f))
+        return dm, dfs
+    t['process_file'], (dm, dfs) = best_of(read_all, repeat)
+    t['smart_merge'], df = best_of(lambda: dm.smart_merge([d.copy() for d in dfs]), repeat)
+    t['solve'], (res, failed) = best_of(lambda: CSPScheduler(df, rooms_df=dm.rooms_df).solve(), repeat)
+    res['Teacher ID'] = res['Teacher ID'].astype(str); res['Group'] = res['Group'].astype(str)
+    # grid ของทุกครู + ทุกกลุ่ม (สิ่งที่ render_timetable_html / หน้า PDF ใช้)
+    t['build_grid'], _ = best_of(lambda: (build_grid(res, 'Teacher ID'), build_grid(res, 'Group')), repeat)
+    rg = ReportGenerator()
+    if 'export_excel' not in skip: t['export_excel'], _ = best_of(lambda: rg.export_excel(res), repeat)
+    if 'export_all_pdfs' not in skip: t['export_all_pdfs'], _ = best_of(lambda: rg.export_all_pdfs(res), repeat)
+    return {'tier': tier, 'seed': seed, 'scale': SIZE_TIERS[tier], 'tasks': len(df), 'booked': len(res), 'failed': len(failed),
+            'teachers': res['Teacher ID'].nunique(), 'groups': res['Group'].nunique(),
+            'seconds': {k: round(v, 4) for k, v in t.items()}}
+
+def run_suite(tiers, seed=0, gen_dir=None, repeat=1, skip=(), json_out=None):
+    gen_dir = gen_dir or os.path.join(tempfile.gettempdir(), 'scheduler_bench')
+    meta = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(), 'python': platform.python_version(),
+            'pandas': pd.__version__, 'cpus': os.cpu_count()}
+    rows = []
+    for tier in tiers:
+        row = dict(meta, **bench_tier(tier, seed, gen_dir, repeat, skip)); rows.append(row)
+        print(f"{tier:>7} tasks={row['tasks']:<6} " + " ".join(f"{k}={v}s" for k, v in row['seconds'].items()))
+        if json_out:
+            with open(json_out, 'a', encoding='utf-8') as f: f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return rows
+
+# ==========================================
+# BENCHMARK: Solver engines (greedy vs backtracking)
+# ==========================================
+# อัตราการจัดได้ / คาบแทน-พิเศษ / เวลา บนชุด gen_data ทุก tier + ชุดฐานที่บีบกลุ่มให้แน่นขึ้นเรื่อยๆ
+def bench_engines(tiers, seed=0, gen_dir=None, data=DEFAULT_DATA, folds=(60, 45, 40, 35, 30), repeat=1, json_out=None):
+    gen_dir = gen_dir or os.path.join(tempfile.gettempdir(), 'scheduler_bench')
+    sets = []
+    for tier in tiers:
+        data_dir = os.path.join(gen_dir, f"{tier}-seed{seed}")
+        if not os.path.exists(os.path.join(data_dir, 'teach.csv')): generate(data_dir, seed=seed, scale=SIZE_TIERS[tier], verbose=False)
+        sets.append((tier, *load_dir(data_dir, SUITE_FILES)))
+    if os.path.exists(os.path.join(data, 'teach.csv')):
+        sets += [(f"fold{g}", load_register(data, g), None) for g in folds]
+    if os.path.exists(os.path.join(data, 'room.csv')):
+        # ชุดเดียวกันแต่มีห้องตายตัว/ประเภทห้อง (ห้องจาก room.csv)
+        rooms_df = load_dir(data, ['room.csv'])[1]; sets += [(f"fold{g}+rooms", assign_rooms(load_register(data, g), rooms_df), rooms_df) for g in folds]
+    meta = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit()}
+    rows = []
+    for name, df, rooms_df in sets:
+        for engine, cls in ENGINES.items():
+            def run():
+                sch = cls(df, rooms_df=rooms_df); sch.solve(); return sch
+            sec, sch = best_of(run, repeat)
+            failed, fallback, spread = sch.score()
+            rows.append({'dataset': name, 'engine': engine, 'tasks': len(df), 'placed_rate': round(1 - failed / len(df), 4),
+                         'failed': failed, 'fallback': fallback, 'spread': spread, 'solve_s': round(sec, 3),
+                         'backtracks': (sch.search_stats or {}).get('backtracks'), 'greedy_kept': (sch.search_stats or {}).get('greedy_kept'),
+                         'timed_out': (sch.search_stats or {}).get('timed_out')})
+    if json_out:
+        with open(json_out, 'a', encoding='utf-8') as f:
+            for r in rows: f.write(json.dumps(dict(meta, **r), ensure_ascii=False) + "\n")
+    return pd.DataFrame(rows)
+
+# ==========================================
+# BENCHMARK: Time grids (ขนาดตารางเวลา -> เวลา check / solve)
+# ==========================================
+# ข้อมูลชุดเดียวกันบน grid ที่ใหญ่ขึ้น: เวลาต่อการ check ควรคงที่ ไม่โตตามจำนวนช่อง
+GRID_PRESETS = {'5x13': dict(), '6x13': dict(n_days=6), '5x26 (30 min)': dict(minutes=30),
+                '6x26 x2 weeks': dict(n_days=6, minutes=30, weeks=2), '7x52 x2 weeks': dict(n_days=7, minutes=15, weeks=2)}
+
+def bench_grids(df, backend='bitset', repeat=1, n=50000):
+    rows = []
+    for name, spec in GRID_PRESETS.items():
+        grid = TimeGrid.from_clock(**spec)
+        solve_s, sch = best_of(lambda: (s := CSPScheduler(df, backend=backend, grid=grid), s.solve())[0], repeat)
+        rows.append({'grid': name, 'slots': grid.n_slots, 'solve_s': round(solve_s, 4), 'check_us': round(bench_check(df, backend, n, grid=grid), 3),
+                     'allocate_us': round(bench_allocate(df, backend, n // 5, grid=grid), 3), 'score': sch.score()})
+    return pd.DataFrame(rows)
+
+def compare_backends(df, repeat=3, n_check=200000, n_allocate=50000):
+    # แถวแรก = engine เดิม (ตัวอ้างอิง); same_as_baseline = ตารางและสาเหตุตกหล่นเหมือนเดิมทุกแถว
+    rows = []; ref = None
+    for name in ['baseline', *OCCUPANCY_BACKENDS]:
+        solve_s, (res, failed) = best_of(lambda: make_scheduler(df, name).solve(), repeat)
+        reasons = [f['Reason'] for f in failed]
+        if ref is None: ref = (res, reasons)
+        rows.append({'backend': name, 'solve_s': round(solve_s, 4), 'check_us': round(bench_check(df, name, n_check), 3),
+                     'allocate_us': round(bench_allocate(df, name, n_allocate), 3), 'booked': len(res), 'failed': len(failed),
+                     'same_as_baseline': res.equals(ref[0]) and reasons == ref[1]})
+    out = pd.DataFrame(rows)
+    for col in ('solve_s', 'check_us', 'allocate_us'): out[f"speedup_{col.rsplit('_', 1)[0]}"] = (out[col].iloc[0] / out[col]).round(2)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark CSPScheduler occupancy backends")
+    ap.add_argument('--data', default=DEFAULT_DATA)
+    ap.add_argument('--fold-groups', type=int, default=0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--pdf', action='store_true', help="also time serial vs parallel All-PDF export")
+    ap.add_argument('--workers', type=int, default=None)
+    ap.add_argument('--suite', action='store_true', help="run the gen_data tier suite instead of the backend comparison")
+    ap.add_argument('--engines', action='store_true', help="compare solver engines on gen_data tiers and folded datasets")
+    ap.add_argument('--grids', action='store_true', help="time check/solve on larger time grids (days x periods x weeks)")
+    ap.add_argument('--tiers', nargs='+', choices=SIZE_TIERS, default=['small', 'base'])
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--gen-dir', default=None, help="where generated tiers are cached (default: temp dir)")
+    ap.add_argument('--skip', nargs='*', choices=SUITE_STAGES, default=[])
+    ap.add_argument('--json-out', default='bench_results.jsonl', help="append one JSON line per tier")
+    args = ap.parse_args()
+
+    if args.suite:
+        run_suite(args.tiers, args.seed, args.gen_dir, args.repeat, args.skip, args.json_out); return
+    if args.engines:
+        print(bench_engines(args.tiers, args.seed, args.gen_dir, args.data, repeat=args.repeat, json_out=args.json_out).to_string(index=False)); return
+    df = load_register(args.data, args.fold_groups)
+    if args.grids:
+        print(bench_grids(df, repeat=args.repeat).to_string(index=False)); return
+    print(f"tasks={len(df)} teachers={df['Teacher ID'].nunique()} groups={df['Group'].nunique()}")
+    print(compare_backends(df, args.repeat).to_string(index=False))
+    if args.pdf: print(bench_pdf(df, args.workers))
+
+
+if __name__ == "__main__":
+    main()
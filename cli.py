@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from ingest import load_dir, inspect_data
+from scheduler import ENGINES, TimeGrid, solve_portfolio, solve_decomposed
+from reports import ReportGenerator
+
+# ==========================================
+# HEADLESS BATCH: ingest -> solve -> export (ไม่โหลด Streamlit)
+# ==========================================
+# ใช้กับ cron/งาน batch: 1 โฟลเดอร์ = 1 ชุดข้อมูล (วิทยาเขต/เทอม) ผลลัพธ์เขียนลง <out>/<ชื่อโฟลเดอร์>/
+#   python cli.py data/campus_a data/campus_b --out results --format csv json --pdf --excel
+#   python cli.py data/ --out results --workers 4   (data/ มีโฟลเดอร์ย่อยหลายชุด)
+FORMATS = ('csv', 'json', 'parquet')
+TABLE_EXT = ('.csv', '.xlsx', '.xls')
+
+def find_datasets(paths):
+    # โฟลเดอร์ที่มีไฟล์ตารางเอง = 1 ชุด, ไม่มีแต่มีโฟลเดอร์ย่อย = ทุกโฟลเดอร์ย่อยเป็นชุดข้อมูล
+    out = []
+    for p in paths:
+        names = sorted(os.listdir(p))
+        if any(n.lower().endswith(TABLE_EXT) for n in names): out.append(p)
+        else: out += [os.path.join(p, n) for n in names if os.path.isdir(os.path.join(p, n))]
+    return out
+
+def write_assignments(res, failed, out_dir, formats):
+    fail_df = pd.DataFrame(failed)
+    for fmt in formats:
+        if fmt == 'csv':
+            res.to_csv(os.path.join(out_dir, 'assignments.csv'), index=False, encoding='utf-8-sig')
+            fail_df.to_csv(os.path.join(out_dir, 'failed.csv'), index=False, encoding='utf-8-sig')
+        elif fmt == 'json':
+            res.to_json(os.path.join(out_dir, 'assignments.json'), orient='records', force_ascii=False, indent=1)
+            fail_df.to_json(os.path.join(out_dir, 'failed.json'), orient='records', force_ascii=False, indent=1, default_handler=str)
+        elif fmt == 'parquet':
+            # ต้องมี pyarrow (หรือ fastparquet); ไม่มีก็ข้ามเฉพาะรูปแบบนี้
+            try: res.to_parquet(os.path.join(out_dir, 'assignments.parquet'), index=False)
+            except ImportError as e: print(f"[skip parquet] {e}")
+
+def run_dataset(data_dir, out_root, opts):
+    name = os.path.basename(os.path.normpath(data_dir)); out_dir = os.path.join(out_root, name)
+    os.makedirs(out_dir, exist_ok=True); timings = {}
+
+    t = time.perf_counter(); df, rooms_df = load_dir(data_dir, opts.get('files'))
+    timings['ingest_s'] = time.perf_counter() - t
+    missing = [c for c in ['Subject ID', 'Teacher ID'] if c not in df.columns]
+    if missing: return {'dataset': name, 'error': f"missing columns: {missing}"}
+    issues = [i['msg'] for i in inspect_data(df)]
+
+    t = time.perf_counter()
+    if opts.get('portfolio', 0) > 1:
+        sch = solve_portfolio(df, n_runs=opts['portfolio'], workers=opts.get('portfolio_workers'), time_budget=opts.get('time_budget'),
+                              base_seed=opts.get('seed') or 0, backend=opts['backend'], rooms_df=rooms_df, profile=opts.get('profile', False),
+                              engine=opts.get('engine', 'greedy'), grid=opts.get('grid'))
+        res, failed = sch.results()
+    elif opts.get('decompose'):
+        # ส่วนที่ไม่เกี่ยวกันจัดพร้อมกัน (หลายชุดข้อมูลใน batch -> portfolio_workers=1 = จัดทั้งก้อน)
+        sch = solve_decomposed(df, rooms_df=rooms_df, workers=opts.get('portfolio_workers'), engine=opts.get('engine', 'greedy'),
+                               backend=opts['backend'], seed=opts.get('seed'), grid=opts.get('grid'))
+        res, failed = sch.results()
+    else:
+        sch = ENGINES[opts.get('engine', 'greedy')](df, backend=opts['backend'], seed=opts.get('seed'), rooms_df=rooms_df, profile=opts.get('profile', False),
+                                                    grid=opts.get('grid'))
+        res, failed = sch.solve()
+    if opts.get('repair'): res, failed = sch.repair(time_limit=opts['repair'], seed=opts.get('seed') or 0)
+    timings['solve_s'] = time.perf_counter() - t
+
+    t = time.perf_counter(); write_assignments(res, failed, out_dir, opts['formats'])
+    if not res.empty and (opts.get('pdf') or opts.get('excel')):
+        res['Teacher ID'] = res['Teacher ID'].astype(str); res['Group'] = res['Group'].astype(str)
+        rg = ReportGenerator(sch.grid)
+        if opts.get('pdf'):
+            pdf = rg.export_all_pdfs_parallel(res) if opts.get('pdf_parallel') else rg.export_all_pdfs(res)
+            with open(os.path.join(out_dir, 'all_schedules.pdf'), 'wb') as f: f.write(pdf)
+        if opts.get('excel'): rg.export_excel(res, os.path.join(out_dir, 'all_schedules.xlsx'), True, True, True)
+    timings['export_s'] = time.perf_counter() - t
+
+    summary = {'dataset': name, 'tasks': len(df), 'booked': len(res), 'failed': len(failed), 'score': list(sch.score()),
+               'issues': issues, **{k: round(v, 3) for k, v in timings.items()}}
+    if sch.portfolio: summary['portfolio'] = {k: v for k, v in sch.portfolio.items() if k != 'scores'}
+    if sch.solve_stats:
+        summary['solve_stats'] = sch.solve_stats.to_dict(); sch.solve_stats.to_json(os.path.join(out_dir, 'solve_stats.json'))
+    if sch.search_stats: summary['search'] = sch.search_stats
+    if sch.decomposition: summary['decomposition'] = sch.decomposition
+    if sch.repair_stats: summary['repair'] = {k: v for k, v in sch.repair_stats.items() if k != 'curve'}
+    with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f: json.dump(summary, f, ensure_ascii=False, indent=1)
+    return summary
+
+def run_batch(datasets, out_root, opts, workers=None):
+    # หลายชุดข้อมูล -> process pool (1 ชุดต่อ worker); ชุดเดียวทำในโปรเซสนี้ และให้ PDF ใช้ pool แทน
+    workers = min(workers or os.cpu_count() or 1, len(datasets))
+    if workers <= 1:
+        return [run_dataset(d, out_root, dict(opts, pdf_parallel=len(datasets) == 1 and (os.cpu_count() or 1) > 1)) for d in datasets]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(run_dataset, d, out_root, dict(opts, portfolio_workers=1)): d for d in datasets}
+        for fut in as_completed(futures):
+            try: results.append(fut.result())
+            except Exception as e: results.append({'dataset': os.path.basename(futures[fut]), 'error': repr(e)})
+    return sorted(results, key=lambda r: r['dataset'])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Solve timetables from input folders without the Streamlit UI")
+    ap.add_argument('inputs', nargs='+', help="dataset folders (or a parent folder of dataset folders)")
+    ap.add_argument('--out', default='results')
+    ap.add_argument('--files', nargs='*', default=None, help="only these file names inside each folder")
+    ap.add_argument('--format', nargs='+', choices=FORMATS, default=['csv', 'json'], dest='formats')
+    ap.add_argument('--pdf', action='store_true', help="write all_schedules.pdf")
+    ap.add_argument('--excel', action='store_true', help="write all_schedules.xlsx (teacher/group/room sheets)")
+    ap.add_argument('--backend', default='bitset')
+    ap.add_argument('--engine', choices=ENGINES, default='greedy', help="greedy pass or backtracking search (MRV + forward checking)")
+    ap.add_argument('--seed', type=int, default=None)
+    ap.add_argument('--portfolio', type=int, default=0, help="multi-start runs per dataset (0 = single solve)")
+    ap.add_argument('--decompose', action='store_true', help="solve independent teacher/group components in parallel")
+    ap.add_argument('--time-budget', type=float, default=None)
+    ap.add_argument('--repair', type=float, default=0, help="local search seconds after solving")
+    ap.add_argument('--workers', type=int, default=None, help="datasets solved in parallel")
+    ap.add_argument('--days', type=int, default=5, choices=range(1, 8), help="school days per week")
+    ap.add_argument('--period-minutes', type=int, default=60, choices=[60, 30, 20, 15], help="length of one period")
+    ap.add_argument('--weeks', type=int, default=1, help="rotation length in weeks (2 = week A/B timetable)")
+    ap.add_argument('--profile', action='store_true', help="per-phase solver stats (solve_stats.json)")
+    args = ap.parse_args(argv)
+
+    datasets = find_datasets(args.inputs)
+    if not datasets: ap.error("no dataset folders found")
+    opts = {'files': args.files, 'formats': args.formats, 'pdf': args.pdf, 'excel': args.excel, 'backend': args.backend, 'engine': args.engine,
+            'grid': TimeGrid.from_clock(args.days, minutes=args.period_minutes, weeks=args.weeks),
+            'seed': args.seed, 'portfolio': args.portfolio, 'decompose': args.decompose, 'time_budget': args.time_budget, 'repair': args.repair, 'profile': args.profile}
+    os.makedirs(args.out, exist_ok=True)
+    t = time.perf_counter(); results = run_batch(datasets, args.out, opts, args.workers)
+    for r in results:
+        if 'error' in r: print(f"{r['dataset']}: ERROR {r['error']}")
+        else: print(f"{r['dataset']}: tasks={r['tasks']} booked={r['booked']} failed={r['failed']} solve={r['solve_s']}s")
+    print(f"{len(results)} dataset(s) in {time.perf_counter() - t:.1f}s -> {args.out}")
+    with open(os.path.join(args.out, 'batch_summary.json'), 'w', encoding='utf-8') as f: json.dump(results, f, ensure_ascii=False, indent=1)
+    return 1 if any('error' in r for r in results) else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
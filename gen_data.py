@@ -1,164 +1,327 @@
-import pandas as pd
-import random
-import os
-
-# --- 1. ตั้งค่า ---
-NUM_TEACHERS = 200
-NUM_SUBJECTS = 400
-NUM_ROOMS = 200
-STUDENTS_PER_GROUP_MIN = 10
-STUDENTS_PER_GROUP_MAX = 40
-
-# --- 2. ตั้งค่าตำแหน่งเซฟไฟล์ (ไว้บน Desktop ให้หาง่ายๆ) ---
-desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-output_folder = os.path.join(desktop_path, "Generated_CSV_Files")
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-
-print(f"📂 กำลังสร้างไฟล์ข้อมูลไว้ที่: {output_folder}")
-print("⏳ กำลังประมวลผล... กรุณารอสักครู่")
-
-# --- ข้อมูลตั้งต้น ---
-first_names = ["สมชาย", "สมหญิง", "มานะ", "มานี", "ปิติ", "ชูใจ", "วีระ", "สุดา", "อำนาจ", "วารี", "กานดา", "วิชัย", "ณเดชน์", "ญาญ่า", "สมศักดิ์", "ธีรเดช", "พัชราภา", "อารยา", "โทนี่", "บรูซ", "คลาร์ก", "ปีเตอร์", "สตีฟ", "นาตาชา"]
-last_names = ["ใจดี", "รักเรียน", "อดทน", "มีสุข", "เจริญ", "มั่นคง", "พากเพียร", "วิชาการ", "เก่งกล้า", "สะอาด", "วงษ์คำเหลา", "มีชัย", "วงศ์สวัสดิ์", "รัตนากร", "จันทร์โอชา", "ชินวัตร", "เวชชาชีวะ", "ลิ้มทองกุล", "ธนาธร", "พิธา"]
-
-departments = {
-    "IT": {"code": "401", "name": "Information Tech"},
-    "AC": {"code": "201", "name": "Accounting"},
-    "MKT": {"code": "202", "name": "Marketing"},
-    "EL": {"code": "104", "name": "Electronics"},
-    "ME": {"code": "101", "name": "Mechanic"},
-    "CV": {"code": "106", "name": "Civil Construction"},
-    "LOG": {"code": "203", "name": "Logistics"},
-    "ARC": {"code": "108", "name": "Architecture"}
-}
-
-group_types = [
-    {"code": "M6", "name": "M.6"},
-    {"code": "Normal", "name": "Normal"},
-    {"code": "Dual", "name": "Dual System"}
-]
-
-# --- เริ่มสร้างข้อมูล ---
-
-# 1. TEACHER
-teachers = []
-for i in range(1, NUM_TEACHERS + 1):
-    tid = f"T{i:03d}" # รหัส 3 หลัก T001
-    tname = f"{random.choice(first_names)} {random.choice(last_names)}"
-    role = "Leader" if i <= (NUM_TEACHERS * 0.1) else "Teacher"
-    teachers.append([tid, tname, role])
-
-df_teachers = pd.DataFrame(teachers, columns=["teacher_id", "teacher_name", "role"])
-df_teachers.to_csv(os.path.join(output_folder, "teacher.csv"), index=False, encoding='utf-8-sig')
-
-# 2. SUBJECT
-subjects = []
-for i in range(NUM_SUBJECTS):
-    level = random.choice(["2", "3"])
-    sType = str(random.randint(0, 3))
-    sCode = f"{random.randint(0, 999):03d}"
-    sGroup = str(random.randint(1, 9))
-    sid = f"{level}{sType}{sCode}-{sGroup}{random.randint(100, 999)}"
-    dept_key = random.choice(list(departments.keys()))
-    sname = f"วิชา {departments[dept_key]['name']} {sCode}"
-    subjects.append([sid, sname, random.randint(1, 3), random.randint(2, 4), random.randint(1, 3)])
-
-df_subjects = pd.DataFrame(subjects, columns=["subject_id", "subject_name", "theory", "practice", "credit"])
-df_subjects.to_csv(os.path.join(output_folder, "subject.csv"), index=False, encoding='utf-8-sig')
-
-# 3. ROOM
-rooms = []
-for i in range(NUM_ROOMS):
-    building = random.randint(1, 15)
-    floor = random.randint(1, 8)
-    room_num = random.randint(1, 20)
-    rid = f"{building}{floor}{room_num:02d}"
-    rname = rid
-    rtype = random.choice(["Lecture Room", "Computer Lab", "Workshop", "Auditorium", "Meeting Room"])
-    rooms.append(["R" + rid, rname, rtype])
-
-df_rooms = pd.DataFrame(rooms, columns=["room_id", "room_name", "room_type"])
-df_rooms.to_csv(os.path.join(output_folder, "room.csv"), index=False, encoding='utf-8-sig')
-
-# 4. GROUP, STUDENT, REGISTER
-groups = []
-students = []
-registers = []
-group_counter = 1
-
-for dept_key, dept_val in departments.items():
-    for level_name, level_code in [("ปวช.", "2"), ("ปวส.", "3")]:
-        years = [1, 2, 3] if level_name == "ปวช." else [1, 2]
-        for y in years:
-            # เพิ่มจำนวนห้องต่อชั้นปีเป็น 3-6 ห้อง เพื่อให้ได้ข้อมูลเยอะ
-            num_groups_in_year = random.randint(3, 6)
-            for g_num in range(1, num_groups_in_year + 1): 
-                gid = f"G{group_counter}"
-                g_type = random.choice(group_types)
-                g_name = f"{level_name}{y}/{g_num}-{dept_key}-{g_type['code']}"
-                advisor = random.choice(teachers)[1]
-                s_count = random.randint(STUDENTS_PER_GROUP_MIN, STUDENTS_PER_GROUP_MAX)
-                
-                groups.append([gid, g_name, s_count, advisor])
-                
-                # Students
-                for s_idx in range(1, s_count + 1):
-                    enroll_year = "67" if y == 1 else ("66" if y == 2 else "65")
-                    full_sid = f"{enroll_year}{level_code}1{dept_val['code']}{g_num:02d}{s_idx:02d}"
-                    s_name = f"{random.choice(first_names)} {random.choice(last_names)}"
-                    reg_sub_name = f"Major {dept_key}"
-                    students.append([full_sid, s_name, reg_sub_name, dept_key, f"{level_name}{y}", gid, g_type['code']])
-
-                # Registers (1 group learns 5-8 subjects)
-                chosen_subjects = random.sample(subjects, random.randint(5, 8))
-                for sub in chosen_subjects:
-                    registers.append([gid, sub[0]])
-
-                group_counter += 1
-
-df_groups = pd.DataFrame(groups, columns=["group_id", "group_name", "student_count", "advisor"])
-df_groups.to_csv(os.path.join(output_folder, "student_group.csv"), index=False, encoding='utf-8-sig')
-
-df_students = pd.DataFrame(students, columns=["student_id", "student_name", "registered_subject", "department", "year", "group_id", "extra_condition"])
-df_students.to_csv(os.path.join(output_folder, "student.csv"), index=False, encoding='utf-8-sig')
-
-df_registers = pd.DataFrame(registers, columns=["group_id", "subject_id"])
-df_registers.to_csv(os.path.join(output_folder, "register.csv"), index=False, encoding='utf-8-sig')
-
-# 5. TIMESLOT
-timeslots = []
-tid_counter = 1
-days = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-periods = [
-    (1, "08:00", "09:00"), (2, "09:00", "10:00"), (3, "10:00", "11:00"), (4, "11:00", "12:00"),
-    (5, "13:00", "14:00"), (6, "14:00", "15:00"), (7, "15:00", "16:00"), (8, "16:00", "17:00"),
-    (9, "17:00", "18:00")
-]
-for d in days:
-    for p_num, start, end in periods:
-        timeslots.append([tid_counter, d, p_num, start, end])
-        tid_counter += 1
-df_timeslots = pd.DataFrame(timeslots, columns=["timeslot_id", "day", "period", "start", "end"])
-df_timeslots.to_csv(os.path.join(output_folder, "timeslot.csv"), index=False, encoding='utf-8-sig')
-
-# 6. TEACH
-teach_recs = []
-for t in teachers:
-    my_subjects = random.sample(subjects, random.randint(1, 5))
-    for sub in my_subjects:
-        teach_recs.append([t[0], sub[0]])
-df_teach = pd.DataFrame(teach_recs, columns=["teacher_id", "subject_id"])
-df_teach.to_csv(os.path.join(output_folder, "teach.csv"), index=False, encoding='utf-8-sig')
-
-# --- เสร็จสิ้น ---
-print("\n" + "="*50)
-print(f"✅ สร้างข้อมูลเสร็จสิ้นเรียบร้อย!")
-print(f"📊 สรุปจำนวนข้อมูลที่สร้างได้:")
-print(f"   - Students: {len(df_students)} คน")
-print(f"   - Groups:   {len(df_groups)} ห้อง")
-print(f"   - Teachers: {len(df_teachers)} คน")
-print(f"   - Subjects: {len(df_subjects)} วิชา")
-print(f"\n📂 ไฟล์ทั้งหมดอยู่ในโฟลเดอร์: {output_folder}")
-print("="*50)
\ No newline at end of file
+import argparse
+import numpy as np
+import pandas as pd
+import random
+import os
+
+# --- 1. ตั้งค่า (ขนาดที่ scale=1) ---
+NUM_TEACHERS = 200
+NUM_SUBJECTS = 400
+NUM_ROOMS = 200
+STUDENTS_PER_GROUP_MIN = 10
+STUDENTS_PER_GROUP_MAX = 40
+GROUPS_PER_YEAR = (3, 6)
+
+# ขนาดชุดข้อมูลสำหรับ benchmark: ตัวคูณจำนวนครู/วิชา/ห้อง/กลุ่ม
+SIZE_TIERS = {'small': 0.25, 'base': 1, 'medium': 3, 'large': 10}
+
+# --- 2. ตั้งค่าตำแหน่งเซฟไฟล์ (ไว้บน Desktop ให้หาง่ายๆ) ---
+desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+DEFAULT_OUTPUT = os.path.join(desktop_path, "Generated_CSV_Files")
+
+# --- ข้อมูลตั้งต้น ---
+first_names = ["สมชาย", "สมหญิง", "มานะ", "มานี", "ปิติ", "ชูใจ", "วีระ", "สุดา", "อำนาจ", "วารี", "กานดา", "วิชัย", "ณเดชน์", "ญาญ่า", "สมศักดิ์", "ธีรเดช", "พัชราภา", "อารยา", "โทนี่", "บรูซ", "คลาร์ก", "ปีเตอร์", "สตีฟ", "นาตาชา"]
+last_names = ["ใจดี", "รักเรียน", "อดทน", "มีสุข", "เจริญ", "มั่นคง", "พากเพียร", "วิชาการ", "เก่งกล้า", "สะอาด", "วงษ์คำเหลา", "มีชัย", "วงศ์สวัสดิ์", "รัตนากร", "จันทร์โอชา", "ชินวัตร", "เวชชาชีวะ", "ลิ้มทองกุล", "ธนาธร", "พิธา"]
+
+departments = {
+    "IT": {"code": "401", "name": "Information Tech"},
+    "AC": {"code": "201", "name": "Accounting"},
+    "MKT": {"code": "202", "name": "Marketing"},
+    "EL": {"code": "104", "name": "Electronics"},
+    "ME": {"code": "101", "name": "Mechanic"},
+    "CV": {"code": "106", "name": "Civil Construction"},
+    "LOG": {"code": "203", "name": "Logistics"},
+    "ARC": {"code": "108", "name": "Architecture"}
+}
+
+group_types = [
+    {"code": "M6", "name": "M.6"},
+    {"code": "Normal", "name": "Normal"},
+    {"code": "Dual", "name": "Dual System"}
+]
+
+def write_timeslots(output_folder):
+    timeslots = []
+    tid_counter = 1
+    days = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+    periods = [
+        (1, "08:00", "09:00"), (2, "09:00", "10:00"), (3, "10:00", "11:00"), (4, "11:00", "12:00"),
+        (5, "13:00", "14:00"), (6, "14:00", "15:00"), (7, "15:00", "16:00"), (8, "16:00", "17:00"),
+        (9, "17:00", "18:00")
+    ]
+    for d in days:
+        for p_num, start, end in periods:
+            timeslots.append([tid_counter, d, p_num, start, end])
+            tid_counter += 1
+    df_timeslots = pd.DataFrame(timeslots, columns=["timeslot_id", "day", "period", "start", "end"])
+    df_timeslots.to_csv(os.path.join(output_folder, "timeslot.csv"), index=False, encoding='utf-8-sig')
+
+def generate(output_folder=DEFAULT_OUTPUT, seed=None, scale=1, verbose=True, departmental=False):
+    # departmental=True: กลุ่มลงเฉพาะวิชาของแผนก และครูสอนเฉพาะวิชาในแผนกตัวเอง (แต่ละแผนกแทบเป็นโรงเรียนย่อยที่แยกกัน)
+    # seed เดียวกัน + scale เดียวกัน = ไฟล์เหมือนเดิมทุกไบต์ (ใช้ทำ benchmark ซ้ำได้)
+    rng = random.Random(seed)
+    n_teachers = max(1, round(NUM_TEACHERS * scale))
+    n_subjects = max(8, round(NUM_SUBJECTS * scale))
+    n_rooms = max(1, round(NUM_ROOMS * scale))
+    g_min, g_max = (max(1, round(n * scale)) for n in GROUPS_PER_YEAR)
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    if verbose:
+        print(f"📂 กำลังสร้างไฟล์ข้อมูลไว้ที่: {output_folder}")
+        print("⏳ กำลังประมวลผล... กรุณารอสักครู่")
+
+    # --- เริ่มสร้างข้อมูล ---
+
+    # 1. TEACHER
+    teachers = []
+    for i in range(1, n_teachers + 1):
+        tid = f"T{i:03d}" # รหัส 3 หลัก T001
+        tname = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+        role = "Leader" if i <= (n_teachers * 0.1) else "Teacher"
+        teachers.append([tid, tname, role])
+
+    df_teachers = pd.DataFrame(teachers, columns=["teacher_id", "teacher_name", "role"])
+    df_teachers.to_csv(os.path.join(output_folder, "teacher.csv"), index=False, encoding='utf-8-sig')
+
+    # 2. SUBJECT
+    subjects = []; dept_subjects = {}
+    for i in range(n_subjects):
+        level = rng.choice(["2", "3"])
+        sType = str(rng.randint(0, 3))
+        sCode = f"{rng.randint(0, 999):03d}"
+        sGroup = str(rng.randint(1, 9))
+        sid = f"{level}{sType}{sCode}-{sGroup}{rng.randint(100, 999)}"
+        dept_key = rng.choice(list(departments.keys()))
+        sname = f"วิชา {departments[dept_key]['name']} {sCode}"
+        subjects.append([sid, sname, rng.randint(1, 3), rng.randint(2, 4), rng.randint(1, 3)])
+        dept_subjects.setdefault(dept_key, []).append(subjects[-1])
+
+    df_subjects = pd.DataFrame(subjects, columns=["subject_id", "subject_name", "theory", "practice", "credit"])
+    df_subjects.to_csv(os.path.join(output_folder, "subject.csv"), index=False, encoding='utf-8-sig')
+
+    # 3. ROOM
+    rooms = []
+    for i in range(n_rooms):
+        building = rng.randint(1, 15)
+        floor = rng.randint(1, 8)
+        room_num = rng.randint(1, 20)
+        rid = f"{building}{floor}{room_num:02d}"
+        rname = rid
+        rtype = rng.choice(["Lecture Room", "Computer Lab", "Workshop", "Auditorium", "Meeting Room"])
+        rooms.append(["R" + rid, rname, rtype])
+
+    df_rooms = pd.DataFrame(rooms, columns=["room_id", "room_name", "room_type"])
+    df_rooms.to_csv(os.path.join(output_folder, "room.csv"), index=False, encoding='utf-8-sig')
+
+    # 4. GROUP, STUDENT, REGISTER
+    groups = []
+    students = []
+    registers = []
+    group_counter = 1
+
+    for dept_key, dept_val in departments.items():
+        for level_name, level_code in [("ปวช.", "2"), ("ปวส.", "3")]:
+            years = [1, 2, 3] if level_name == "ปวช." else [1, 2]
+            for y in years:
+                # เพิ่มจำนวนห้องต่อชั้นปีเป็น 3-6 ห้อง เพื่อให้ได้ข้อมูลเยอะ
+                num_groups_in_year = rng.randint(g_min, g_max)
+                for g_num in range(1, num_groups_in_year + 1): 
+                    gid = f"G{group_counter}"
+                    g_type = rng.choice(group_types)
+                    g_name = f"{level_name}{y}/{g_num}-{dept_key}-{g_type['code']}"
+                    advisor = rng.choice(teachers)[1]
+                    s_count = rng.randint(STUDENTS_PER_GROUP_MIN, STUDENTS_PER_GROUP_MAX)
+
+                    groups.append([gid, g_name, s_count, advisor])
+
+                    # Students
+                    for s_idx in range(1, s_count + 1):
+                        enroll_year = "67" if y == 1 else ("66" if y == 2 else "65")
+                        full_sid = f"{enroll_year}{level_code}1{dept_val['code']}{g_num:02d}{s_idx:02d}"
+                        s_name = f"{rng.choice(first_names)} {rng.choice(last_names)}"
+                        reg_sub_name = f"Major {dept_key}"
+                        students.append([full_sid, s_name, reg_sub_name, dept_key, f"{level_name}{y}", gid, g_type['code']])
+
+                    # Registers (1 group learns 5-8 subjects)
+                    pool = dept_subjects.get(dept_key, subjects) if departmental else subjects
+                    chosen_subjects = rng.sample(pool, min(rng.randint(5, 8), len(pool)))
+                    for sub in chosen_subjects:
+                        registers.append([gid, sub[0]])
+
+                    group_counter += 1
+
+    df_groups = pd.DataFrame(groups, columns=["group_id", "group_name", "student_count", "advisor"])
+    df_groups.to_csv(os.path.join(output_folder, "student_group.csv"), index=False, encoding='utf-8-sig')
+
+    df_students = pd.DataFrame(students, columns=["student_id", "student_name", "registered_subject", "department", "year", "group_id", "extra_condition"])
+    df_students.to_csv(os.path.join(output_folder, "student.csv"), index=False, encoding='utf-8-sig')
+
+    df_registers = pd.DataFrame(registers, columns=["group_id", "subject_id"])
+    df_registers.to_csv(os.path.join(output_folder, "register.csv"), index=False, encoding='utf-8-sig')
+
+    # 5. TIMESLOT
+    write_timeslots(output_folder)
+
+    # 6. TEACH
+    teach_recs = []
+    dept_keys = [k for k in departments if k in dept_subjects]
+    for i, t in enumerate(teachers):
+        pool = dept_subjects[dept_keys[i % len(dept_keys)]] if departmental else subjects
+        my_subjects = rng.sample(pool, min(rng.randint(1, 5), len(pool)))
+        for sub in my_subjects:
+            teach_recs.append([t[0], sub[0]])
+    df_teach = pd.DataFrame(teach_recs, columns=["teacher_id", "subject_id"])
+    df_teach.to_csv(os.path.join(output_folder, "teach.csv"), index=False, encoding='utf-8-sig')
+
+    # --- เสร็จสิ้น ---
+    counts = {'students': len(df_students), 'groups': len(df_groups), 'teachers': len(df_teachers), 'subjects': len(df_subjects),
+              'rooms': len(df_rooms), 'registers': len(df_registers), 'teach': len(df_teach)}
+    if verbose:
+        print("\n" + "="*50)
+        print(f"✅ สร้างข้อมูลเสร็จสิ้นเรียบร้อย!")
+        print(f"📊 สรุปจำนวนข้อมูลที่สร้างได้:")
+        print(f"   - Students: {len(df_students)} คน")
+        print(f"   - Groups:   {len(df_groups)} ห้อง")
+        print(f"   - Teachers: {len(df_teachers)} คน")
+        print(f"   - Subjects: {len(df_subjects)} วิชา")
+        print(f"\n📂 ไฟล์ทั้งหมดอยู่ในโฟลเดอร์: {output_folder}")
+        print("="*50)
+    return counts
+
+# ==========================================
+# FAST MODE: NumPy batch sampling + เขียนไฟล์ใหญ่ทีละ chunk (โรงเรียนระดับล้านคน)
+# ==========================================
+# schema และการแจกแจงเหมือน generate() แต่สุ่มเป็นก้อนด้วย numpy (ผลไม่ตรงกับ generate() ที่ seed เดียวกัน)
+LEVELS = [("ปวช.", "2", [1, 2, 3]), ("ปวส.", "3", [1, 2])]
+ENROLL_YEAR = {1: "67", 2: "66", 3: "65"}
+ROOM_TYPES = ["Lecture Room", "Computer Lab", "Workshop", "Auditorium", "Meeting Room"]
+
+def _s(a): return np.asarray(a).astype(str).astype(object)
+def _zfill(a, w): return np.char.zfill(np.asarray(a).astype(str), w).astype(object)
+
+def _pick_distinct(rng, n_rows, n_items, k):
+    # k ตัวเลือกไม่ซ้ำกันต่อแถว: สุ่มทั้งก้อนแล้วสุ่มใหม่เฉพาะแถวที่มีค่าซ้ำ (รายการน้อยใช้ argsort แทน)
+    if n_items < 4 * k: return np.argsort(rng.random((n_rows, n_items)), axis=1)[:, :k]
+    out = rng.integers(0, n_items, size=(n_rows, k))
+    while True:
+        s = np.sort(out, axis=1); bad = (s[:, 1:] == s[:, :-1]).any(axis=1)
+        if not bad.any(): return out
+        out[bad] = rng.integers(0, n_items, size=(int(bad.sum()), k))
+
+def _pick_in_pools(rng, row_pool, pools, k):
+    # เหมือน _pick_distinct แต่แต่ละแถวเลือกจาก pool ของตัวเอง (ดัชนีวิชาของแผนก) -> (ดัชนี k ช่อง, จำนวนช่องที่ใช้ได้ = min(k, ขนาด pool))
+    pick = np.zeros((len(row_pool), k), dtype=np.int64); width = np.zeros(len(row_pool), dtype=np.int64)
+    for p, pool in enumerate(pools):
+        rows = np.flatnonzero(row_pool == p); w = min(k, len(pool))
+        pick[rows, :w] = pool[_pick_distinct(rng, len(rows), len(pool), w)]; width[rows] = w
+    return pick, width
+
+def _write(df, path, first):
+    # chunk แรกเขียนหัวตาราง + BOM, chunk ถัดไปต่อท้าย
+    df.to_csv(path, index=False, header=first, mode='w' if first else 'a', encoding='utf-8-sig' if first else 'utf-8')
+
+def generate_fast(output_folder=DEFAULT_OUTPUT, seed=None, scale=1, students=None, chunk_groups=20000, verbose=True, departmental=False):
+    # departmental=True: เหมือน generate() -- กลุ่มลงเฉพาะวิชาของแผนก ครูสอนเฉพาะวิชาในแผนกตัวเอง
+    rng = np.random.default_rng(seed)
+    n_teachers = max(1, round(NUM_TEACHERS * scale))
+    n_subjects = max(8, round(NUM_SUBJECTS * scale))
+    n_rooms = max(1, round(NUM_ROOMS * scale))
+    cells = [(dk, dv, ln, lc, y) for dk, dv in departments.items() for ln, lc, years in LEVELS for y in years]
+    if students:
+        # จำนวนกลุ่มต่อชั้นปีให้ได้นักเรียนราว `students` คน (สัดส่วนช่วงเดียวกับ 3-6)
+        mean = students / ((STUDENTS_PER_GROUP_MIN + STUDENTS_PER_GROUP_MAX) / 2) / len(cells)
+        g_min = max(1, round(mean * 2 / 3)); g_max = max(g_min, round(mean * 4 / 3))
+    else: g_min, g_max = (max(1, round(n * scale)) for n in GROUPS_PER_YEAR)
+    os.makedirs(output_folder, exist_ok=True)
+    if verbose: print(f"📂 กำลังสร้างไฟล์ข้อมูล (fast) ไว้ที่: {output_folder}")
+    first, last = np.array(first_names, dtype=object), np.array(last_names, dtype=object)
+    def names(n): return first[rng.integers(0, len(first), n)] + " " + last[rng.integers(0, len(last), n)]
+
+    # 1. TEACHER
+    t_num = np.arange(1, n_teachers + 1); t_names = names(n_teachers)
+    t_ids = "T" + _zfill(t_num, 3)
+    pd.DataFrame({"teacher_id": t_ids, "teacher_name": t_names, "role": np.where(t_num <= n_teachers * 0.1, "Leader", "Teacher")}
+                 ).to_csv(os.path.join(output_folder, "teacher.csv"), index=False, encoding='utf-8-sig')
+
+    # 2. SUBJECT
+    dept_keys = list(departments); dept_names = np.array([departments[k]['name'] for k in dept_keys], dtype=object)
+    s_code = _zfill(rng.integers(0, 1000, n_subjects), 3)
+    s_ids = (_s(rng.choice(["2", "3"], n_subjects)) + _s(rng.integers(0, 4, n_subjects)) + s_code + "-"
+             + _s(rng.integers(1, 10, n_subjects)) + _s(rng.integers(100, 1000, n_subjects)))
+    s_dept = rng.integers(0, len(dept_keys), n_subjects)
+    pd.DataFrame({"subject_id": s_ids, "subject_name": "วิชา " + dept_names[s_dept] + " " + s_code,
+                  "theory": rng.integers(1, 4, n_subjects), "practice": rng.integers(2, 5, n_subjects), "credit": rng.integers(1, 4, n_subjects)}
+                 ).to_csv(os.path.join(output_folder, "subject.csv"), index=False, encoding='utf-8-sig')
+
+    # 3. ROOM
+    r_ids = _s(rng.integers(1, 16, n_rooms)) + _s(rng.integers(1, 9, n_rooms)) + _zfill(rng.integers(1, 21, n_rooms), 2)
+    pd.DataFrame({"room_id": "R" + r_ids, "room_name": r_ids, "room_type": np.array(ROOM_TYPES, dtype=object)[rng.integers(0, len(ROOM_TYPES), n_rooms)]}
+                 ).to_csv(os.path.join(output_folder, "room.csv"), index=False, encoding='utf-8-sig')
+
+    # 4. GROUP (ทั้งตาราง), STUDENT + REGISTER (ทีละ chunk ของกลุ่ม)
+    per_cell = rng.integers(g_min, g_max + 1, len(cells)); n_groups = int(per_cell.sum())
+    cell = np.repeat(np.arange(len(cells)), per_cell)
+    g_num = np.arange(n_groups) - np.repeat(np.cumsum(per_cell) - per_cell, per_cell) + 1
+    c_dept = np.array([c[0] for c in cells], dtype=object)[cell]; c_code = np.array([c[1]['code'] for c in cells], dtype=object)[cell]
+    c_level = np.array([c[2] for c in cells], dtype=object)[cell]; c_lcode = np.array([c[3] for c in cells], dtype=object)[cell]
+    c_year = np.array([c[4] for c in cells])[cell]
+    # departmental: pool วิชาของแต่ละแผนก (แผนกที่ไม่มีวิชาเลยใช้ทุกวิชา เหมือน generate())
+    pools = [np.flatnonzero(s_dept == d) for d in range(len(dept_keys))]; pools = [p if len(p) else np.arange(n_subjects) for p in pools]
+    g_pool = np.array([dept_keys.index(c[0]) for c in cells])[cell]
+    g_type = np.array([t['code'] for t in group_types], dtype=object)[rng.integers(0, len(group_types), n_groups)]
+    s_count = rng.integers(STUDENTS_PER_GROUP_MIN, STUDENTS_PER_GROUP_MAX + 1, n_groups)
+    g_ids = "G" + _s(np.arange(1, n_groups + 1)); g_num_s = _s(g_num); year_s = c_level + _s(c_year)
+    pd.DataFrame({"group_id": g_ids, "group_name": year_s + "/" + g_num_s + "-" + c_dept + "-" + g_type,
+                  "student_count": s_count, "advisor": t_names[rng.integers(0, n_teachers, n_groups)]}
+                 ).to_csv(os.path.join(output_folder, "student_group.csv"), index=False, encoding='utf-8-sig')
+
+    enroll = np.array([ENROLL_YEAR[y] for y in (1, 2, 3)], dtype=object)
+    n_students = 0; n_registers = 0
+    for lo in range(0, n_groups, chunk_groups):
+        hi = min(lo + chunk_groups, n_groups); gi = np.repeat(np.arange(lo, hi), s_count[lo:hi])
+        s_idx = np.arange(len(gi)) - np.repeat(np.cumsum(s_count[lo:hi]) - s_count[lo:hi], s_count[lo:hi]) + 1
+        sid = enroll[c_year[gi] - 1] + c_lcode[gi] + "1" + c_code[gi] + _zfill(g_num[gi], 2) + _zfill(s_idx, 2)
+        _write(pd.DataFrame({"student_id": sid, "student_name": names(len(gi)), "registered_subject": "Major " + c_dept[gi],
+                             "department": c_dept[gi], "year": year_s[gi], "group_id": g_ids[gi], "extra_condition": g_type[gi]}),
+               os.path.join(output_folder, "student.csv"), lo == 0)
+        # Registers (1 group learns 5-8 subjects)
+        if departmental: pick, width = _pick_in_pools(rng, g_pool[lo:hi], pools, 8)
+        else: pick, width = _pick_distinct(rng, hi - lo, n_subjects, 8), 8
+        keep = np.arange(8) < np.minimum(rng.integers(5, 9, hi - lo), width)[:, None]
+        _write(pd.DataFrame({"group_id": np.repeat(g_ids[lo:hi], keep.sum(axis=1)), "subject_id": s_ids[pick[keep]]}),
+               os.path.join(output_folder, "register.csv"), lo == 0)
+        n_students += len(gi); n_registers += int(keep.sum())
+
+    # 5. TIMESLOT
+    write_timeslots(output_folder)
+
+    # 6. TEACH (1-5 วิชาต่อครู)
+    if departmental:
+        # ครูคนที่ i อยู่แผนก i mod (จำนวนแผนกที่มีวิชา) เหมือน generate()
+        has = np.unique(s_dept); pick, width = _pick_in_pools(rng, has[np.arange(n_teachers) % len(has)], pools, 5)
+    else: pick, width = _pick_distinct(rng, n_teachers, n_subjects, 5), 5
+    keep = np.arange(5) < np.minimum(rng.integers(1, 6, n_teachers), width)[:, None]
+    pd.DataFrame({"teacher_id": np.repeat(t_ids, keep.sum(axis=1)), "subject_id": s_ids[pick[keep]]}
+                 ).to_csv(os.path.join(output_folder, "teach.csv"), index=False, encoding='utf-8-sig')
+
+    counts = {'students': n_students, 'groups': n_groups, 'teachers': n_teachers, 'subjects': n_subjects,
+              'rooms': n_rooms, 'registers': n_registers, 'teach': int(keep.sum())}
+    if verbose: print(f"✅ เสร็จสิ้น: {counts}")
+    return counts
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate synthetic school CSV files")
+    ap.add_argument('--out', default=DEFAULT_OUTPUT)
+    ap.add_argument('--seed', type=int, default=None, help="fixed seed = reproducible files")
+    ap.add_argument('--tier', choices=SIZE_TIERS, default=None, help="size preset (overrides --scale)")
+    ap.add_argument('--scale', type=float, default=1, help="multiplier for teachers/subjects/rooms/groups")
+    ap.add_argument('--fast', action='store_true', help="NumPy batch generator, streams big files in chunks")
+    ap.add_argument('--students', type=int, default=None, help="(fast) target number of students, e.g. 1000000")
+    ap.add_argument('--departmental', action='store_true', help="subjects and teachers stay inside one department")
+    args = ap.parse_args(argv)
+    scale = SIZE_TIERS[args.tier] if args.tier else args.scale
+    if args.fast or args.students: generate_fast(args.out, seed=args.seed, scale=scale, students=args.students, departmental=args.departmental)
+    else: generate(args.out, seed=args.seed, scale=scale, departmental=args.departmental)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import re
+import os
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from pandas.io.parsers import TextParser
+
+# ==========================================
+# DATA MANAGER (ingest / merge) - ไม่ผูกกับ Streamlit ใช้ได้ทั้งแอปและ CLI
+# ==========================================
+# Ingestion: CSV หา header จาก sample ส่วนหัวไฟล์ (ไฟล์ใหญ่อ่านเป็น chunk), Excel parse ครั้งเดียว
+HEADER_SAMPLE_ROWS = 20
+CSV_CHUNK_BYTES = 8 * 1024 * 1024; CSV_CHUNK_ROWS = 200_000
+ID_COLUMNS = {'Subject Id', 'Teacher Id', 'Group', 'Room'}
+KEY_COLUMNS = ['Subject ID', 'Teacher ID', 'Group', 'Room']
+
+class SmartDataManager:
+    def __init__(self):
+        self.col_mapping = {
+            'subject id': ['subject_id', 'course_id', 'รหัสวิชา'], 
+            'subject name': ['subject_name', 'course_name', 'ชื่อวิชา'],
+            'teacher id': ['teacher_id', 'instructor_id', 'รหัสครู', 'ครูผู้สอน'],
+            'credits': ['credits', 'credit', 'หน่วยกิต', 'ท-ป-น'],
+            'group': ['group', 'group_id', 'section', 'class', 'กลุ่มเรียน', 'ห้อง'],
+            'room type': ['room_type', 'room type', 'ประเภทห้อง'], # ต้องมาก่อน 'room'
+            'room': ['room', 'location', 'สถานที่', 'ห้องเรียน'] # เพิ่ม Mapping ห้องเรียน
+        }
+        self.rooms_df = None
+    def clean_teacher_name(self, name):
+        if not isinstance(name, str): return str(name)
+        return re.sub(r'^(นาย|นาง|นางสาว|ดร\.|ผศ\.|รศ\.|ว่าที่ร\.ต\.|อาจารย์|อ\.)', '', name).strip()
+    def deduplicate_columns(self, df):
+        cols = pd.Series(df.columns)
+        for dup in cols[cols.duplicated()].unique(): cols[cols == dup] = [dup + '_' + str(i) if i != 0 else dup for i in range(sum(cols == dup))]
+        df.columns = cols; return df
+    def find_header_row(self, df):
+        max_matches = 0; header_idx = 0; all_kw = [k for v in self.col_mapping.values() for k in v]
+        for i, row in enumerate(df.head(HEADER_SAMPLE_ROWS).itertuples(index=False, name=None)):
+            row_str = [str(x).lower() for x in row]
+            matches = sum(1 for val in row_str if any(k in val for k in all_kw))
+            if matches > max_matches: max_matches = matches; header_idx = i
+        return header_idx
+    def standard_name(self, col):
+        c_str = str(col).strip().lower()
+        for std, kws in self.col_mapping.items():
+            if any(k in c_str for k in kws): return std.title()
+        return None
+    def read_table(self, file_obj, idx):
+        # CSV: อ่านไฟล์จริงครั้งเดียวด้วย header ที่หาได้จาก sample; คอลัมน์รหัส (ครู/วิชา/กลุ่ม/ห้อง) อ่านเป็น str ตั้งแต่แรก
+        head = pd.read_csv(file_obj, header=idx, nrows=0)
+        dtype = {c: str for c in head.columns if self.standard_name(c) in ID_COLUMNS}
+        file_obj.seek(0, 2); size = file_obj.tell(); file_obj.seek(0)
+        if size < CSV_CHUNK_BYTES: return pd.read_csv(file_obj, header=idx, dtype=dtype)
+        # CSV ใหญ่: ย่อคอลัมน์รหัสของแต่ละ chunk เป็น categorical ก่อนต่อกัน -> ถือแค่ codes + ค่าไม่ซ้ำ ไม่ถือ str ทั้งไฟล์พร้อมกัน
+        chunks = [compact_chunk(c, dtype) for c in pd.read_csv(file_obj, header=idx, dtype=dtype, chunksize=CSV_CHUNK_ROWS)]
+        return pd.DataFrame({c: union_categoricals([ch[c] for ch in chunks]) if c in dtype else pd.concat([ch[c] for ch in chunks], ignore_index=True) for c in chunks[0].columns})
+    def read_excel_table(self, file_obj, idx=None):
+        # Excel อ่านเป็น chunk ไม่ได้: parse ครั้งเดียวเป็นค่าดิบ (header=None) แล้วหา header / ตัดเนื้อหา / แปลงชนิดจาก frame เดียวกัน
+        # (ช่องว่าง -> "" ให้ TextParser ตั้งชื่อ Unnamed / แปลงเป็น NaN แบบเดียวกับ read_excel(header=idx))
+        raw = pd.read_excel(file_obj, header=None, dtype=object)
+        if idx is None: idx = self.find_header_row(raw)
+        rows = raw.iloc[idx:].fillna("").values.tolist()
+        head = TextParser(rows[:1], header=0).read().columns
+        dtype = {c: str for c in head if self.standard_name(c) in ID_COLUMNS}
+        return TextParser(rows, header=0, dtype=dtype, skip_blank_lines=False).read()
+    def process_file(self, file_obj, manual_header=None):
+        try:
+            if not file_obj.name.endswith('.csv'): df = self.read_excel_table(file_obj, manual_header)
+            else:
+                if manual_header is not None: idx = manual_header
+                else:
+                    # หา header จาก sample ส่วนหัวไฟล์เท่านั้น ไม่ parse ทั้งไฟล์แบบ header=None
+                    sample = pd.read_csv(file_obj, header=None, nrows=HEADER_SAMPLE_ROWS)
+                    idx = self.find_header_row(sample); file_obj.seek(0)
+                df = self.read_table(file_obj, idx)
+        except: return None
+        new_cols = {}
+        for col in df.columns:
+            std = self.standard_name(col)
+            if std: new_cols[col] = std
+        df.rename(columns=new_cols, inplace=True)
+        
+        # Standardize Names
+        norm_map = {'Subject Id': 'Subject ID', 'Subject Name': 'Subject Name', 'Teacher Id': 'Teacher ID', 'Credits': 'Credits'}
+        df.rename(columns=norm_map, inplace=True); df = self.deduplicate_columns(df)
+        # categorical จาก chunk ที่ไม่ใช่คีย์ merge (เช่นคอลัมน์ซ้ำ Group_1) -> คืนเป็น str แบบอ่านทั้งไฟล์
+        for c in df.columns[[isinstance(t, pd.CategoricalDtype) for t in df.dtypes]].difference(KEY_COLUMNS): df[c] = df[c].astype(df[c].cat.categories.dtype)
+        if 'Teacher ID' in df.columns:
+            # ทำความสะอาดชื่อครูเฉพาะค่าที่ไม่ซ้ำ แล้ว map กลับ (ครู 1 คนมีหลายร้อยแถว)
+            uniq = df['Teacher ID'].unique()
+            df['Teacher ID'] = df['Teacher ID'].map(pd.Series([self.clean_teacher_name(x) for x in uniq], index=uniq))
+        return df
+    
+    def smart_merge(self, dfs):
+        if not dfs: return pd.DataFrame()
+        processed_dfs = []
+        for df in dfs:
+            # ไฟล์รายชื่อห้อง (Room + Room Type) แยกเก็บไว้ใช้เป็นทรัพยากร ไม่นำไป merge
+            if 'Room' in df.columns and 'Room Type' in df.columns and 'Subject ID' not in df.columns and 'Teacher ID' not in df.columns:
+                rooms = df[['Room', 'Room Type']].dropna().astype(str).drop_duplicates('Room')
+                self.rooms_df = rooms if self.rooms_df is None else pd.concat([self.rooms_df, rooms]).drop_duplicates('Room')
+                continue
+            if 'Group' in df.columns and 'Subject ID' in df.columns and 'Teacher ID' not in df.columns:
+                df_agg = df[['Subject ID', 'Group']].drop_duplicates(); processed_dfs.append(df_agg)
+            else: processed_dfs.append(df)
+        if not processed_dfs: return pd.DataFrame()
+        processed_dfs.sort(key=lambda x: 1 if 'Teacher ID' in x.columns else 0, reverse=True)
+        # คีย์ merge แปลงครั้งเดียวเป็น categorical ที่ใช้ categories ชุดเดียวกันทุกไฟล์ -> merge บน codes
+        processed_dfs = compact_keys(processed_dfs)
+        base_df = self.relational_merge(processed_dfs)
+        if base_df is None: base_df = self.generic_merge(processed_dfs)
+        return self.finalize(base_df)
+
+    def table_role(self, df):
+        has = [c in df.columns for c in ('Teacher ID', 'Subject ID', 'Group')]
+        if has == [True, True, False]: return 'teach'        # ครู -> วิชา
+        if has == [False, True, True]: return 'register'     # กลุ่ม -> วิชา
+        if has == [True, True, True]: return 'assigned'      # จับคู่ครบแล้ว
+        if sum(has) == 1: return 'attr'                      # ตารางคุณสมบัติ (subject / teacher / group)
+        if sum(has) == 0: return 'other'                     # ไม่มีคีย์ (เช่น timeslot) ไม่ใช้ในการ merge
+        return None
+
+    def relational_merge(self, dfs):
+        # teach + register: แจกครูให้คู่ (กลุ่ม, วิชา) ผ่าน index ตามรหัสวิชา ไม่สร้าง cross product ครู x กลุ่ม
+        roles = {}
+        for d in dfs: roles.setdefault(self.table_role(d), []).append(d)
+        if 'teach' not in roles or 'register' not in roles or None in roles: return None
+        teach = pd.concat(roles['teach'], ignore_index=True).dropna(subset=['Subject ID']).drop_duplicates(['Teacher ID', 'Subject ID'], ignore_index=True)
+        reg = pd.concat(roles['register'], ignore_index=True)[['Subject ID', 'Group']].dropna(subset=['Subject ID']).drop_duplicates(ignore_index=True)
+
+        n_sub = len(teach['Subject ID'].cat.categories)
+        t_codes = teach['Subject ID'].cat.codes.to_numpy(); r_codes = reg['Subject ID'].cat.codes.to_numpy()
+        by_subject = np.argsort(t_codes, kind='stable')                       # แถวครูเรียงตามวิชา
+        count = np.bincount(t_codes, minlength=n_sub); start = np.cumsum(count) - count
+        taught = count[r_codes] > 0                                            # วิชาที่ไม่มีครูสอน = ตกไปเหมือนเดิม
+        rank = reg.groupby('Subject ID', observed=True).cumcount().to_numpy()  # กลุ่มที่ i ของวิชา -> ครูคนที่ i mod n
+        pick = by_subject[start[r_codes[taught]] + rank[taught] % count[r_codes[taught]]]
+        order = np.argsort(pick, kind='stable')                                # เรียงตามแถวครูเหมือนผล merge เดิม
+        pairs = teach.iloc[pick[order]].reset_index(drop=True)
+        pairs['Group'] = pd.Categorical.from_codes(reg['Group'].cat.codes.to_numpy()[taught][order], dtype=reg['Group'].dtype)
+        # ครูที่วิชาไม่มีกลุ่มลงทะเบียน: คงไว้แบบไม่มีกลุ่ม (จะได้ NoGroup_i)
+        idle = teach[~np.isin(t_codes, r_codes)].copy()
+        idle['Group'] = pd.Categorical.from_codes(np.full(len(idle), -1), dtype=reg['Group'].dtype)
+        base_df = pd.concat([pairs, idle] + roles.get('assigned', []), ignore_index=True)
+
+        # ตารางคุณสมบัติ: join แบบ many-to-one บนคีย์เดียว; คีย์ซ้ำ (เช่น รายชื่อนักเรียนต่อกลุ่ม) ไม่ใช่ตารางคุณสมบัติ -> ข้าม
+        for attr in roles.get('attr', []):
+            key = next(c for c in ('Subject ID', 'Teacher ID', 'Group') if c in attr.columns)
+            cols = [key] + [c for c in attr.columns if c not in base_df.columns]
+            attr = attr[cols].dropna(subset=[key])
+            if len(cols) == 1 or attr[key].duplicated().any(): continue
+            base_df = base_df.merge(attr, on=key, how='left', validate='many_to_one')
+        return base_df
+
+    def generic_merge(self, processed_dfs):
+        base_df = processed_dfs[0]
+        for i in range(1, len(processed_dfs)):
+            other_df = processed_dfs[i]
+            common = [c for c in base_df.columns if c in other_df.columns]
+            if common:
+                for col in common:
+                    if col in KEY_COLUMNS: continue
+                    base_df[col] = base_df[col].astype(str); other_df[col] = other_df[col].astype(str)
+                base_df = pd.merge(base_df, other_df, on=common, how='left')
+            else: base_df = pd.concat([base_df, other_df], ignore_index=True)
+        return base_df
+
+    def finalize(self, base_df):
+        base_df.drop_duplicates(subset=['Teacher ID', 'Subject ID', 'Group'], inplace=True)
+        
+        if 'Group' in base_df.columns:
+            g = base_df['Group']
+            if isinstance(g.dtype, pd.CategoricalDtype):
+                blank = np.flatnonzero(g.cat.categories.astype(str).str.strip() == '')
+                mask = (g.isna() | g.cat.codes.isin(blank)).to_numpy()
+            else: mask = (g.isna() | (g.astype(str).str.strip() == '')).to_numpy()
+            if mask.any():
+                fill = [f"NoGroup_{i}" for i in range(mask.sum())]
+                if isinstance(g.dtype, pd.CategoricalDtype):
+                    codes = g.cat.codes.to_numpy().copy(); codes[mask] = np.arange(len(fill)) + len(g.cat.categories)
+                    base_df['Group'] = pd.Categorical.from_codes(codes, categories=g.cat.categories.append(pd.Index(fill)))
+                else: base_df.loc[mask, 'Group'] = fill
+        
+        if 'Subject ID' in base_df.columns and 'Subject Name' not in base_df.columns: base_df['Subject Name'] = base_df['Subject ID']
+        if 'Credits' not in base_df.columns: base_df['Credits'] = 2
+        if 'Group' not in base_df.columns: base_df['Group'] = 'G-Mix'
+        
+        # Handle Room Default
+        if 'Room' not in base_df.columns: base_df['Room'] = '-'
+        else:
+            room = base_df['Room']
+            if isinstance(room.dtype, pd.CategoricalDtype) and '-' not in room.cat.categories: room = room.cat.add_categories('-')
+            base_df['Room'] = room.fillna('-')
+        base_df['Credits'] = pd.to_numeric(base_df['Credits'], errors='coerce', downcast='integer').fillna(2)
+            
+        return base_df.reset_index(drop=True)
+
+def compact_chunk(chunk, cols):
+    # คอลัมน์รหัส (str) ของ chunk -> categorical; คอลัมน์อื่นคงเดิม
+    for c in cols: chunk[c] = chunk[c].astype('category')
+    return chunk
+
+def compact_keys(dfs):
+    # รหัสครู/วิชา/กลุ่ม/ห้อง -> categorical ชุดเดียวกันทุก frame: factorize รวดเดียวแล้วแบ่ง codes คืน
+    # (ค่าว่างยังเป็น NaN ไม่กลายเป็น 'nan')
+    out = [d.copy(deep=False) for d in dfs]
+    for col in KEY_COLUMNS:
+        have = [d for d in out if col in d.columns]
+        if not have: continue
+        s = pd.concat([d[col].astype(d[col].cat.categories.dtype) if isinstance(d[col].dtype, pd.CategoricalDtype) else d[col] for d in have], ignore_index=True)
+        if not pd.api.types.is_string_dtype(s): s = s.where(s.isna(), s.astype(str))
+        codes, uniques = pd.factorize(s); dtype = pd.CategoricalDtype(pd.Index(uniques))
+        pos = 0
+        for d in have:
+            n = len(d); d[col] = pd.Categorical.from_codes(codes[pos:pos + n], dtype=dtype); pos += n
+    return out
+
+def load_dir(data_dir, names=None):
+    # อ่านทุกไฟล์ .csv/.xlsx ในโฟลเดอร์ (หรือเฉพาะ names) แล้ว merge -> (register_df, rooms_df)
+    dm = SmartDataManager(); dfs = []
+    names = names or sorted(f for f in os.listdir(data_dir) if f.lower().endswith(('.csv', '.xlsx', '.xls')))
+    for name in names:
+        with open(os.path.join(data_dir, name), 'rb') as f:
+            d = dm.process_file(f)
+            if d is not None: dfs.append(d)
+    return dm.smart_merge(dfs), dm.rooms_df
+
+# ==========================================
+# 3. DATA INSPECTOR
+# ==========================================
+def inspect_data(df):
+    issues = []
+    if 'Group' in df.columns:
+        nan_groups = df[df['Group'].isna()]
+        if not nan_groups.empty: issues.append({'type': 'Error', 'msg': f"พบวิชากลุ่มเรียนเป็นค่าว่าง (NaN) {len(nan_groups)} รายการ", 'data': nan_groups})
+    if 'Teacher ID' in df.columns:
+        nan_teachers = df[df['Teacher ID'].isna()]
+        if not nan_teachers.empty: issues.append({'type': 'Warning', 'msg': f"พบวิชาไม่มีครูผู้สอน {len(nan_teachers)} รายการ", 'data': nan_teachers})
+    return issues
@@ -0,0 +1,188 @@
+import hashlib
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from scheduler import ENGINES, SolveControl, solve_portfolio, solve_decomposed
+from reports import ReportGenerator, frame_digest
+
+# ==========================================
+# SHARED JOB QUEUE (server-wide, bounded process pool)
+# ==========================================
+# ทุก session ของ Streamlit ส่งงานหนัก (solve / export) เข้าคิวเดียวกัน: จำนวน process คงที่ เครื่องไม่ล่ม
+# งานที่เหมือนกันทุกอย่าง (ข้อมูล + ตัวเลือก) ใช้ job เดียวกัน คนที่ส่งซ้ำได้ผลเดียวกันโดยไม่ต้องคำนวณใหม่
+# ฟังก์ชันงานต้องอยู่ระดับ module (spawn ต้อง import ได้) และรับ control เป็นพารามิเตอร์แรก
+SYNC_EVERY_S = 0.25
+PREVIEW_ROWS = 200      # การจองล่าสุดที่ส่งให้หน้าเว็บดูระหว่างจัด
+
+def job_key(kind, *parts):
+    # DataFrame -> hash เนื้อข้อมูล, อย่างอื่น -> repr (None = ไม่มีข้อมูลส่วนนั้น)
+    h = hashlib.sha256(kind.encode())
+    for p in parts: h.update((frame_digest(p) if isinstance(p, pd.DataFrame) else repr(p)).encode())
+    return h.hexdigest()
+
+class SharedControl(SolveControl):
+    """SolveControl inside a pool worker: progress is pushed to, and cancel read from, a manager dict.
+
+    Syncs at most every SYNC_EVERY_S seconds, so the per-task cost stays one clock read. Each sync
+    also publishes the newest PREVIEW_ROWS bookings for the live preview.
+    """
+    def __init__(self, channel, job_id, time_limit=None):
+        super().__init__(time_limit); self.channel = channel; self.job_id = job_id; self._last = 0.0
+
+    def sync(self):
+        self._last = time.perf_counter(); self.channel[self.job_id] = self.progress()
+        self.channel[('partial', self.job_id)] = self.partial(PREVIEW_ROWS)
+        if self.channel.get(('cancel', self.job_id)): self.cancel()
+
+    def should_stop(self):
+        # ระหว่างรอผลจาก process อื่น (portfolio/decompose) ไม่มี step -> sync ตรงนี้ด้วย
+        if time.perf_counter() - self._last > SYNC_EVERY_S: self.sync()
+        return super().should_stop()
+
+    def begin(self, total, stage='allocate'):
+        super().begin(total, stage); self.sync()
+
+    def step(self, ok):
+        super().step(ok)
+        if time.perf_counter() - self._last > SYNC_EVERY_S: self.sync()
+
+def _run_job(job_id, channel, time_limit, fn, args):
+    ctl = SharedControl(channel, job_id, time_limit); ctl.sync()
+    try: return fn(ctl, *args)
+    finally: ctl.sync()
+
+# --- งานที่ส่งเข้าคิวได้ ---
+def solve_job(ctl, df, rooms_df, prev, portfolio, repair_s, profile, engine='greedy', decompose=None, grid=None):
+    # decompose = จำนวน process สำหรับจัดส่วนที่ไม่เกี่ยวกันพร้อมกัน (None = จัดทั้งก้อน)
+    if prev is not None:
+        sch = ENGINES[engine](df, rooms_df=rooms_df, profile=profile, control=ctl, grid=grid); res, failed = sch.solve_incremental(prev)
+    elif portfolio:
+        ctl.stage = 'portfolio'
+        sch = solve_portfolio(df, rooms_df=rooms_df, profile=profile, engine=engine, grid=grid, control=ctl, **portfolio); sch.control = ctl
+        res, failed = sch.results()
+    elif decompose:
+        ctl.stage = 'decompose'
+        sch = solve_decomposed(df, rooms_df=rooms_df, workers=decompose, engine=engine, grid=grid, control=ctl)
+        res, failed = sch.results()
+    else:
+        sch = ENGINES[engine](df, rooms_df=rooms_df, profile=profile, control=ctl, grid=grid); res, failed = sch.solve()
+    if repair_s and not ctl.should_stop(): res, failed = sch.repair(time_limit=repair_s)
+    sch.control = None
+    return sch, res, failed
+
+def export_job(ctl, kind, df, grid, *args):
+    ctl.stage = 'export'
+    return ReportGenerator(grid).cached(kind, df, *args)
+
+class _Job:
+    __slots__ = ('id', 'kind', 'key', 'owners', 'future', 'dropped')
+    def __init__(self, job_id, kind, key, owner, future):
+        self.id = job_id; self.kind = kind; self.key = key; self.owners = {owner}; self.future = future
+        self.dropped = False
+
+class JobQueue:
+    """Bounded process pool shared by every session, with de-duplication by content key.
+
+    submit() returns a job id (an existing one for an identical key) or None when the queue is full;
+    owners poll status()/progress() and read result() once the job is done.
+    """
+    def __init__(self, max_workers=None, max_pending=16, max_per_owner=2, keep_done=32):
+        # เหลือ 1 core ให้ตัว server (Streamlit / การ render หน้าเว็บ)
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) - 1)
+        self.max_pending = max_pending; self.max_per_owner = max_per_owner; self.keep_done = keep_done
+        self.jobs = OrderedDict(); self.by_key = {}; self._ids = itertools.count(1); self._lock = threading.Lock()
+        # spawn: ไม่ fork process ของ server ที่มีหลาย thread
+        ctx = mp.get_context('spawn')
+        self.manager = ctx.Manager(); self.channel = self.manager.dict()
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+
+    def _active(self, owner=None):
+        return [j for j in self.jobs.values() if not j.future.done() and (owner is None or owner in j.owners)]
+
+    def _evict(self):
+        done = [j for j in self.jobs.values() if j.future.done()]
+        for j in done[:max(0, len(done) - self.keep_done)]:
+            del self.jobs[j.id]
+            for k in (j.id, ('cancel', j.id), ('partial', j.id)): self.channel.pop(k, None)
+            if self.by_key.get(j.key) == j.id: del self.by_key[j.key]
+
+    def submit(self, owner, kind, fn, *args, key=None, time_limit=None):
+        with self._lock:
+            jid = self.by_key.get(key) if key else None
+            if jid in self.jobs:
+                job = self.jobs[jid]
+                # งานเดิมที่ล้มเหลว/ถูกยกเลิก (ผลไม่ครบ) ไม่นำกลับมาใช้
+                if not job.dropped and (not job.future.done() or self.status(jid) == 'done'):
+                    job.owners.add(owner); return jid
+            if len(self._active()) >= self.max_pending or len(self._active(owner)) >= self.max_per_owner: return None
+            jid = f"{kind}-{next(self._ids)}"
+            fut = self.pool.submit(_run_job, jid, self.channel, time_limit, fn, args)
+            job = self.jobs[jid] = _Job(jid, kind, key, owner, fut)
+            if key: self.by_key[key] = jid
+            self._evict()
+            return jid
+
+    def status(self, jid):
+        job = self.jobs.get(jid)
+        if job is None: return None
+        f = job.future
+        if f.cancelled(): return 'cancelled'
+        if f.done(): return 'failed' if f.exception() is not None else 'done'
+        # worker เขียน progress ตอนเริ่ม -> มี entry แปลว่ากำลังรัน (future.running() จริงตั้งแต่ตอนส่งเข้า call queue)
+        return 'running' if jid in self.channel else 'queued'
+
+    def progress(self, jid):
+        p = self.channel.get(jid)
+        if p is None: return {'done': 0, 'total': 0, 'placed': 0, 'failed': 0, 'phase': None, 'stage': None,
+                              'elapsed': 0.0, 'stopped': None, 'fraction': 0.0}
+        return p
+
+    def spare_cpus(self):
+        # core ที่ไม่มีงานของคิวรันอยู่: ใช้กำหนดจำนวน process ย่อยของงานที่จะส่ง (portfolio / PDF ขนาน)
+        running = sum(1 for jid in list(self.jobs) if self.status(jid) == 'running')
+        return max(0, (os.cpu_count() or 1) - running)
+
+    def position(self, jid):
+        # ลำดับในคิว (0 = กำลังรัน/ถัดไป) สำหรับแสดงผล
+        queued = [j.id for j in list(self.jobs.values()) if self.status(j.id) == 'queued']
+        return queued.index(jid) if jid in queued else 0
+
+    def partial(self, jid):
+        # การจองล่าสุดของงานที่กำลังรัน (preview); ยังไม่มี = DataFrame ว่าง
+        p = self.channel.get(('partial', jid))
+        return pd.DataFrame() if p is None else p
+
+    def result(self, jid):
+        return self.jobs[jid].future.result()
+
+    def error(self, jid):
+        f = self.jobs[jid].future
+        return None if f.cancelled() or not f.done() else f.exception()
+
+    def cancel(self, jid, owner):
+        # งานที่มีหลายคนรอ: แค่ถอนชื่อเจ้าของ ยกเลิกจริงเมื่อไม่เหลือใครรอ
+        with self._lock:
+            job = self.jobs.get(jid)
+            if job is None: return
+            job.owners.discard(owner)
+            if job.owners: return
+            job.dropped = True
+            if not job.future.cancel(): self.channel[('cancel', jid)] = True
+
+    def run(self, owner, kind, fn, *args, key=None, timeout=None):
+        # ส่งแล้วรอผล (ปุ่มดาวน์โหลด): คิวเต็ม -> ทำใน process นี้แทน
+        jid = self.submit(owner, kind, fn, *args, key=key)
+        if jid is None: return fn(SolveControl(), *args)
+        return self.jobs[jid].future.result(timeout=timeout)
+
+    def stats(self):
+        states = [self.status(jid) for jid in list(self.jobs)]
+        return {'workers': self.max_workers, **{s: states.count(s) for s in ('queued', 'running', 'done', 'failed', 'cancelled')}}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True); self.manager.shutdown()
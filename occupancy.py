@@ -0,0 +1,171 @@
+import numpy as np
+
+# ==========================================
+# OCCUPANCY BACKENDS (Teacher / Group / Room)
+# ==========================================
+# ทุก backend ใช้ "mask" แบบ int เป็นภาษากลาง: bit s = slot s (day * periods + period)
+# ทำให้การเช็คช่วงเวลา = AND ครั้งเดียวกับ window mask ที่คำนวณไว้ล่วงหน้า
+
+def slots_mask(slots):
+    # ช่วงต่อเนื่อง (กรณีส่วนใหญ่) = shift ครั้งเดียว ไม่วนทีละช่อง (grid หลายร้อยช่องก็ไม่ช้าลง)
+    if isinstance(slots, range) and slots.step == 1: return ((1 << len(slots)) - 1) << slots.start if len(slots) else 0
+    m = 0
+    for s in slots: m |= 1 << s
+    return m
+
+def mask_slots(mask):
+    # คืน slot index ที่เป็น 1 เรียงจากน้อยไปมาก
+    out = []
+    while mask:
+        low = mask & -mask; out.append(low.bit_length() - 1); mask ^= low
+    return out
+
+class BitsetOccupancy:
+    """Each entity is one Python int; bit s set = slot s busy."""
+    def __init__(self, n_slots):
+        self.n_slots = n_slots; self.full = (1 << n_slots) - 1
+        self.base = 0; self.rows = {}
+    def __contains__(self, key): return key in self.rows
+    def add(self, key):
+        if key not in self.rows: self.rows[key] = self.base
+    def set_base(self, mask):
+        # Fixed blocks (พัก/โฮมรูม/กิจกรรม) ถูกจองให้ทุกคนพร้อมกัน
+        self.base |= mask
+        for k in self.rows: self.rows[k] |= mask
+    def get(self, key): return self.rows.get(key, self.base)
+    def mark(self, key, mask): self.rows[key] = self.rows.get(key, self.base) | mask
+    def release(self, key, mask): self.rows[key] = self.rows.get(key, self.base) & ~mask
+    def restore(self, key, row): self.rows[key] = row
+    def free_count(self, key): return self.n_slots - self.get(key).bit_count()
+
+class MatrixOccupancy:
+    """All entities as rows of one packed uint64 matrix (n_entities x n_words)."""
+    def __init__(self, n_slots):
+        self.n_slots = n_slots; self.full = (1 << n_slots) - 1
+        self.n_words = (n_slots + 63) // 64
+        self.index = {}; self.base = 0
+        self.data = np.zeros((16, self.n_words), dtype=np.uint64)
+    def _words(self, mask): return [(mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(self.n_words)]
+    def _row(self, key):
+        if key not in self.index:
+            if len(self.index) == len(self.data):
+                self.data = np.vstack([self.data, np.zeros_like(self.data)])
+            self.index[key] = len(self.index); self.data[self.index[key]] = self._words(self.base)
+        return self.index[key]
+    def __contains__(self, key): return key in self.index
+    def add(self, key): self._row(key)
+    def set_base(self, mask):
+        self.base |= mask
+        n = len(self.index)
+        if n: self.data[:n] |= np.array(self._words(mask), dtype=np.uint64)
+    def get(self, key):
+        if key not in self.index: return self.base
+        m = 0
+        for w, v in enumerate(self.data[self.index[key]]): m |= int(v) << (64 * w)
+        return m
+    def mark(self, key, mask): self.restore(key, self.get(key) | mask)
+    def release(self, key, mask): self.restore(key, self.get(key) & ~mask)
+    def restore(self, key, row): self.data[self._row(key)] = self._words(row)
+    def free_count(self, key): return self.n_slots - self.get(key).bit_count()
+
+OCCUPANCY_BACKENDS = {'bitset': BitsetOccupancy, 'matrix': MatrixOccupancy}
+
+# ==========================================
+# WINDOW FINDER (all days in one pass)
+# ==========================================
+class WindowFinder:
+    """Feasible start slots of a `dur`-long window inside a free mask, for the whole week at once."""
+    def __init__(self, n_days, periods_per_day):
+        self.n_days = n_days; self.ppd = periods_per_day
+        self.day_full = (1 << periods_per_day) - 1
+        self._valid = {}
+
+    def valid_starts(self, dur, max_period):
+        # start ที่ไม่ล้นข้ามวันและไม่เกิน max_period (cache ตาม (dur, max_period))
+        key = (dur, max_period)
+        if key not in self._valid:
+            per_day = slots_mask(range(max(0, max_period - dur + 1)))
+            self._valid[key] = sum(per_day << (d * self.ppd) for d in range(self.n_days))
+        return self._valid[key]
+
+    def start_mask(self, free, dur, max_period):
+        # bit s = 1 ถ้า slot s..s+dur-1 ว่างทั้งหมด (shift-AND แทนการวนทีละช่อง)
+        if dur <= 0: return 0
+        f = free; span = 1
+        while span < dur:
+            step = min(span, dur - span); f &= f >> step; span += step
+        return f & self.valid_starts(dur, max_period)
+
+    def iter_starts(self, starts, day_order):
+        for d in day_order:
+            bits = (starts >> (d * self.ppd)) & self.day_full
+            while bits:
+                low = bits & -bits; yield d * self.ppd + low.bit_length() - 1; bits ^= low
+
+    def first_start(self, starts, day_order):
+        for d in day_order:
+            bits = (starts >> (d * self.ppd)) & self.day_full
+            if bits: return d * self.ppd + (bits & -bits).bit_length() - 1
+        return None
+
+    def overlap_starts(self, start, dur, other_dur):
+        # start ของหน้าต่างยาว other_dur ที่ทับกับหน้าต่าง [start, start+dur)
+        lo = max(0, start - other_dur + 1)
+        return slots_mask(range(lo, start + dur))
+
+# ==========================================
+# ROOM AVAILABILITY INDEX (type -> free rooms per slot)
+# ==========================================
+class RoomIndex:
+    """For every room type and slot, a bitmask of rooms of that type that are still free.
+
+    A window [start, start+dur) has a free room of a type iff the AND of its per-slot
+    masks is non-zero; the lowest set bit is the room picked. `open[type]` keeps the slots
+    where at least one room of the type is free, updated on occupy/release.
+    """
+    def __init__(self, n_slots, rooms):
+        self.n_slots = n_slots
+        self.members = {}; self.type_of = {}; self.bit = {}
+        for room, rtype in rooms:
+            if room in self.type_of: continue
+            lst = self.members.setdefault(rtype, [])
+            self.type_of[room] = rtype; self.bit[room] = 1 << len(lst); lst.append(room)
+        self.free = {t: [(1 << len(lst)) - 1] * n_slots for t, lst in self.members.items()}
+        self.open = {t: (1 << n_slots) - 1 for t in self.members}
+
+    def __contains__(self, room): return room in self.type_of
+
+    def find(self, rtype, start, dur):
+        m = -1; col = self.free[rtype]
+        for s in range(start, start + dur):
+            m &= col[s]
+            if not m: return None
+        return self.members[rtype][(m & -m).bit_length() - 1]
+
+    def pick(self, rtype, slots):
+        m = -1; col = self.free[rtype]
+        for s in slots: m &= col[s]
+        return self.members[rtype][(m & -m).bit_length() - 1] if m else None
+
+    def capacity(self, rtype, mask):
+        # จำนวน (ห้อง, slot) ของประเภทนี้ที่ยังว่างภายใน mask
+        col = self.free[rtype]
+        return sum(col[s].bit_count() for s in mask_slots(mask & self.open[rtype]))
+
+    def free_slots_mask(self, rtype):
+        # slot ที่ยังมีห้องประเภทนี้ว่างอย่างน้อย 1 ห้อง
+        return self.open[rtype]
+
+    def occupy(self, room, slots):
+        if room not in self.type_of: return
+        rtype = self.type_of[room]; col = self.free[rtype]; b = ~self.bit[room]; full = 0
+        for s in slots:
+            col[s] &= b
+            if not col[s]: full |= 1 << s
+        if full: self.open[rtype] &= ~full
+
+    def release(self, room, slots):
+        if room not in self.type_of: return
+        rtype = self.type_of[room]; col = self.free[rtype]; b = self.bit[room]
+        for s in slots: col[s] |= b
+        self.open[rtype] |= slots_mask(slots)
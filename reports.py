@@ -0,0 +1,237 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import pandas as pd
+import xlsxwriter
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from fpdf import FPDF
+from scheduler import DEFAULT_GRID
+
+# ==========================================
+# REPORT GENERATOR (PDF / Excel)
+# ==========================================
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'THSarabunNew.ttf')
+
+BLOCK_LABELS = {'homeroom': "HR", 'activity': "Act", 'lunch': "Lunch"}
+BLOCK_COLORS = {'homeroom': (255, 249, 196), 'activity': (225, 190, 231), 'lunch': (255, 205, 210)}
+PAGE_W = 297; PAGE_H = 210   # A4 แนวนอน (mm)
+
+def build_grid(df, key_col=None, time_grid=None):
+    # แปลงผลลัพธ์ครั้งเดียวเป็น {(day_idx, period): record} (หรือ {entity: {...}} ถ้าระบุ key_col)
+    # ช่องละ 1 รายการแรกตามลำดับในตาราง เหมือน match.iloc[0] เดิม -> renderer อ่านได้ O(1)
+    day_index = (time_grid or DEFAULT_GRID).day_index
+    cols = list(df.columns); grid = {}
+    for row in df.itertuples(index=False, name=None):
+        rec = dict(zip(cols, row))
+        cells = grid.setdefault(rec[key_col], {}) if key_col else grid
+        cells.setdefault((day_index.get(rec['Day']), rec['Period']), rec)
+    return grid
+
+def frame_digest(df):
+    h = hashlib.sha256(str(list(df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+class ReportGenerator:
+    # Cache ไฟล์ export ร่วมกันทั้ง server: key = (ชนิด, hash ของตารางผลลัพธ์, grid, ตัวเลือก)
+    CACHE_SIZE = 16
+    MAX_STREAMED_SHEETS = 500   # export_excel: ชีตมากกว่านี้ไม่ใช้ constant_memory (ulimit -n มัก 1024)
+    _cache = OrderedDict(); _cache_lock = threading.Lock()
+
+    def __init__(self, grid=None):
+        self.grid = grid or DEFAULT_GRID   # วัน/คาบ/ช่องตายตัวของตาราง (ต้องเป็น grid เดียวกับที่ใช้จัด)
+
+    def cached(self, kind, df, *args):
+        key = (kind, frame_digest(df), self.grid.key) + args
+        with self._cache_lock:
+            if key in self._cache: self._cache.move_to_end(key); return self._cache[key]
+        out = getattr(self, kind)(df, *args)
+        if isinstance(out, io.BytesIO): out = out.getvalue()
+        with self._cache_lock:
+            self._cache[key] = out
+            while len(self._cache) > self.CACHE_SIZE: self._cache.popitem(last=False)
+        return out
+
+    def export_excel(self, df, path=None, by_group=False, by_room=False, grids=False):
+        # constant_memory: เขียนทีละแถวลงไฟล์ชั่วคราว ไม่เก็บทั้ง workbook ไว้ในหน่วยความจำ
+        # แต่เปิดไฟล์ชั่วคราวค้างไว้ชีตละ 1 ไฟล์จนปิด workbook -> ชีตเกิน MAX_STREAMED_SHEETS ใช้โหมดปกติ (เก็บในหน่วยความจำ)
+        # path=None -> คืน BytesIO (ปุ่มดาวน์โหลด), ระบุ path -> เขียนลงดิสก์ตรงๆ (งาน batch)
+        output = path if path is not None else io.BytesIO()
+        cols = list(df.columns); used = set()
+
+        # สร้างชีตตามลำดับ All -> ครู -> กลุ่ม -> ห้อง (ลำดับที่พบในตาราง) แล้ววนแถวครั้งเดียวเขียนทุกชีต
+        parts = [('Teacher ID', '')]
+        if by_group: parts.append(('Group', 'G-'))
+        if by_room and 'Room' in cols: parts.append(('Room', 'R-'))
+        names = [(('All',), 'All')] + [((col, v), prefix + str(v)) for col, prefix in parts for v in df[col].unique()]
+        n_sheets = len(names) + (grids and len(parts))
+        streamed = n_sheets <= self.MAX_STREAMED_SHEETS
+        wb = xlsxwriter.Workbook(output, {'constant_memory': True} if streamed else {'in_memory': True})
+        head = wb.add_format({'bold': True, 'border': 1})
+        sheets = {key: [self._add_sheet(wb, name, used, cols, head), 1] for key, name in names}
+        pos = [(col, cols.index(col)) for col, _ in parts]
+        for row in df.itertuples(index=False, name=None):
+            for key in [('All',)] + [(col, row[i]) for col, i in pos]:
+                entry = sheets[key]; _write_row(entry[0], entry[1], row); entry[1] += 1
+
+        if grids:
+            fmts = self._grid_formats(wb)
+            g = self.grid
+            self._write_grid_sheet(wb, self._safe_name('Grid Teachers', used), build_grid(df, 'Teacher ID', g), "Teacher", fmts)
+            if by_group: self._write_grid_sheet(wb, self._safe_name('Grid Groups', used), build_grid(df, 'Group', g), "Group", fmts)
+            if by_room and 'Room' in cols: self._write_grid_sheet(wb, self._safe_name('Grid Rooms', used), build_grid(df, 'Room', g), "Room", fmts)
+        wb.close(); return output
+
+    def _safe_name(self, name, used):
+        safe = re.sub(r'[\\/*?:\[\]]', "", name)[:30] or "Sheet"; base = safe; n = 1
+        while safe.lower() in used: n += 1; safe = f"{base[:27]}~{n}"
+        used.add(safe.lower()); return safe
+
+    def _add_sheet(self, wb, name, used, cols, head):
+        ws = wb.add_worksheet(self._safe_name(name, used)); ws.write_row(0, 0, cols, head)
+        return ws
+
+    def _grid_formats(self, wb):
+        base = {'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True, 'font_size': 9}
+        return {
+            'title': wb.add_format({'bold': True, 'font_size': 12}),
+            'head': wb.add_format(dict(base, bold=True, bg_color='#37474f', font_color='white')),
+            'card': wb.add_format(dict(base, bg_color='#dcf0ff')), 'free': wb.add_format(base),
+            'HR': wb.add_format(dict(base, bg_color='#fff9c4')), 'Act': wb.add_format(dict(base, bg_color='#e1bee7')),
+            'Lunch': wb.add_format(dict(base, bg_color='#ffcdd2')),
+        }
+
+    def _write_grid_sheet(self, wb, name, grid, mode, f):
+        # ตารางแบบเดียวกับหน้า PDF: entity ละ 1 บล็อก (หัวเรื่อง + แถวเวลา + แถวละวัน) เรียงต่อกันลงมา
+        tg = self.grid; ppd = tg.ppd
+        ws = wb.add_worksheet(name); ws.set_column(0, 0, 12); ws.set_column(1, ppd, 13); r = 0
+        for ent in sorted(grid):
+            cells = grid[ent]
+            ws.write_string(r, 0, f"Schedule: {mode} {ent}", f['title']); r += 1
+            ws.write_string(r, 0, "", f['head'])
+            for p, t in enumerate(tg.starts): ws.write_string(r, p + 1, t, f['head'])
+            r += 1
+            for d_idx, day in enumerate(tg.days):
+                ws.set_row(r, 36); ws.write_string(r, 0, day, f['head']); skip = 0
+                for p in range(ppd):
+                    if skip > 0: skip -= 1; continue
+                    info = cells.get((d_idx, p))
+                    if info is not None:
+                        dur = min(int(info['Duration']), ppd - p)
+                        if mode == "Teacher": line2 = str(info['Group'])
+                        elif mode == "Group": line2 = str(info['Teacher ID'])
+                        else: line2 = f"{info['Teacher ID']}\n{info['Group']}"
+                        text = f"{info['Subject Name']}\n{line2}"
+                        if dur > 1: ws.merge_range(r, p + 1, r, p + dur, text, f['card'])
+                        else: ws.write_string(r, p + 1, text, f['card'])
+                        skip = dur - 1
+                    elif (block := tg.block(d_idx, p)): label = BLOCK_LABELS[block]; ws.write_string(r, p + 1, label, f[label])
+                    else: ws.write_blank(r, p + 1, None, f['free'])
+                r += 1
+            r += 1
+    
+    def _create_pdf_page(self, pdf, cells, title, mode, font_ready):
+        pdf.add_page()
+        tg = self.grid
+        # คาบ/วันมากขึ้น -> ช่องแคบ/เตี้ยลงให้พอดีหน้า (grid มาตรฐานได้ขนาดเดิม 19 x 22 mm)
+        margin = 10; day_w = 20; header_h = 8
+        col_w = min(19, (PAGE_W - 2 * margin - day_w) // tg.ppd); row_h = min(22, (PAGE_H - 2 * margin - 10 - header_h) / tg.n_days)
+        
+        pdf.set_font_size(16); pdf.cell(0, 10, title, ln=True, align='C')
+        pdf.set_font_size(10 if font_ready else 8)
+        
+        pdf.set_x(margin + day_w)
+        for t in tg.starts: pdf.cell(col_w, header_h, t, 1, 0, 'C')
+        pdf.ln(header_h)
+        
+        for d_idx, day in enumerate(tg.days):
+            pdf.set_x(margin); pdf.cell(day_w, row_h, day, 1, 0, 'C')
+            skip = 0
+            for p in range(tg.ppd):
+                if skip > 0: skip -= 1; continue
+                block = tg.block(d_idx, p)
+                info = cells.get((d_idx, p))
+                x_curr = pdf.get_x(); y_curr = pdf.get_y()
+                
+                if info is not None:
+                    dur = info['Duration']
+                    subj = str(info['Subject Name'])[:15]
+                    
+                    # Logic for displaying text based on mode
+                    line2 = ""
+                    if mode == "Teacher": line2 = str(info['Group'])
+                    elif mode == "Group": line2 = str(info['Teacher ID'])
+                    elif mode == "Room": line2 = f"{str(info['Teacher ID'])}\n{str(info['Group'])}"
+                    
+                    if len(line2) > 12 and mode != "Room": line2 = line2[:10] + ".." 
+                    
+                    pdf.set_fill_color(220, 240, 255)
+                    pdf.cell(col_w * dur, row_h, "", 1, 0, 'C', fill=True)
+                    pdf.set_xy(x_curr, y_curr + 4)
+                    pdf.multi_cell(col_w * dur, 4, f"{subj}\n{line2}", 0, 'C')
+                    pdf.set_xy(x_curr + (col_w * dur), y_curr)
+                    skip = dur - 1
+                elif block:
+                    pdf.set_fill_color(*BLOCK_COLORS[block]); pdf.cell(col_w, row_h, BLOCK_LABELS[block], 1, 0, 'C', fill=True)
+                else:
+                    pdf.cell(col_w, row_h, "", 1, 0, 'C')
+            pdf.ln(row_h)
+        pdf.set_fill_color(255, 255, 255)  # คืน state เริ่มต้น ให้ทุกหน้าเริ่มเหมือนกัน (serial = parallel)
+
+    def _new_pdf(self):
+        pdf = FPDF(orientation='L', unit='mm', format='A4')
+        font_ready = os.path.exists(FONT_PATH)
+        if font_ready: 
+            pdf.add_font('THSarabunNew', '', FONT_PATH, uni=True); pdf.set_font('THSarabunNew', '', 10)
+        else: pdf.set_font('Arial', '', 8)
+        pdf.set_fill_color(255, 255, 255)
+        return pdf, font_ready
+
+    def export_pdf_grid(self, df, title, mode):
+        pdf, font_ready = self._new_pdf()
+        self._create_pdf_page(pdf, build_grid(df, time_grid=self.grid), title, mode, font_ready)
+        return pdf.output(dest='S').encode('latin-1')
+
+    def page_jobs(self, df):
+        # ลำดับหน้า: ครูทุกคน (เรียงรหัส) แล้วตามด้วยกลุ่มเรียนทุกกลุ่ม
+        by_t = build_grid(df, 'Teacher ID', self.grid); by_g = build_grid(df, 'Group', self.grid)
+        jobs = [(by_t[t], f"Schedule: Teacher {t}", "Teacher") for t in sorted(by_t)]
+        jobs += [(by_g[g], f"Schedule: Group {g}", "Group") for g in sorted(by_g)]
+        return jobs
+
+    def export_all_pdfs(self, df):
+        pdf, font_ready = self._new_pdf()
+        for cells, title, mode in self.page_jobs(df): self._create_pdf_page(pdf, cells, title, mode, font_ready)
+        return pdf.output(dest='S').encode('latin-1')
+
+    def export_all_pdfs_parallel(self, df, workers=None, batch_size=16):
+        # แต่ละ worker มี FPDF + font ของตัวเอง ส่งกลับเฉพาะ content stream ของหน้าและตัวอักษรที่ใช้
+        jobs = self.page_jobs(df)
+        batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+            parts = list(ex.map(_render_pdf_batch, batches, repeat(self.grid)))
+        pdf, _ = self._new_pdf()
+        for pages, subsets in parts:
+            for content in pages:
+                pdf.add_page(); pdf.pages[pdf.page] = content
+            for key, used in subsets.items():
+                have = set(pdf.fonts[key]['subset'])
+                pdf.fonts[key]['subset'].extend(c for c in used if c not in have)
+        return pdf.output(dest='S').encode('latin-1')
+
+def _write_row(ws, r, values):
+    for c, v in enumerate(values):
+        if v is None or v is pd.NA or (isinstance(v, float) and v != v): continue
+        if isinstance(v, str): ws.write_string(r, c, v)  # กันข้อความที่ขึ้นต้นด้วย '=' ถูกตีความเป็นสูตร
+        else: ws.write(r, c, v)
+
+def _render_pdf_batch(batch, grid=None):
+    rg = ReportGenerator(grid); pdf, font_ready = rg._new_pdf()
+    for cells, title, mode in batch: rg._create_pdf_page(pdf, cells, title, mode, font_ready)
+    pages = [pdf.pages[n] for n in range(1, pdf.page + 1)]
+    subsets = {k: list(dict.fromkeys(f['subset'])) for k, f in pdf.fonts.items() if f.get('type') == 'TTF'}
+    return pages, subsets
@@ -0,0 +1,1160 @@
+import bisect
+import copy
+import heapq
+import json
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+from array import array
+import numpy as np
+import pandas as pd
+from occupancy import OCCUPANCY_BACKENDS, WindowFinder, RoomIndex, slots_mask, mask_slots
+
+# ==========================================
+# TIME GRID
+# ==========================================
+DAYS = ['จันทร์', 'อังคาร', 'พุธ', 'พฤหัสบดี', 'ศุกร์']
+TIMES = [f"{h:02d}:00-{(h+1):02d}:00" for h in range(8, 21)]
+
+LUNCH_SLOT_INDEX = 4        # 12:00-13:00
+HOMEROOM_DAY = 0; HOMEROOM_SLOT = 0
+ACTIVITY_DAY = 2; ACTIVITY_SLOTS = [7, 8]
+WEEK_DAYS = DAYS + ['เสาร์', 'อาทิตย์']
+
+def clock_times(start='08:00', end='21:00', minutes=60):
+    # ป้ายคาบ "HH:MM-HH:MM" ช่วงละ minutes นาที
+    to_min = lambda t: int(t[:2]) * 60 + int(t[3:5]); fmt = lambda m: f"{m // 60:02d}:{m % 60:02d}"
+    return [f"{fmt(m)}-{fmt(m + minutes)}" for m in range(to_min(start), to_min(end), minutes)]
+
+class TimeGrid:
+    """Days x periods layout of one timetable cycle; slot = day * periods + period.
+
+    Slot arithmetic, labels and the blocked-slot masks are computed once here and shared by the
+    solver, occupancy structures and renderers. `weeks` > 1 repeats the week as a rotation (A, B, ...);
+    register hours are then per rotation. A task of h hours takes h * 60 / minutes consecutive slots.
+    Lunch cells are relaxed by the lunch/evening phases; homeroom/activity cells never are.
+    """
+    def __init__(self, days=DAYS, times=TIMES, regular_periods=12, lunch=(LUNCH_SLOT_INDEX,),
+                 homeroom=((HOMEROOM_DAY, HOMEROOM_SLOT),), activity=tuple((ACTIVITY_DAY, p) for p in ACTIVITY_SLOTS), weeks=1, minutes=60):
+        if 60 % minutes: raise ValueError(f"period length must divide an hour (got {minutes} minutes)")
+        week = list(days); n_week = len(week)
+        self.days = week if weeks == 1 else [f"{d} ({chr(65 + w)})" for w in range(weeks) for d in week]
+        self.times = list(times); self.starts = [t.split('-')[0] for t in self.times]
+        self.weeks = weeks; self.minutes = minutes; self.slots_per_hour = 60 // minutes
+        self.n_days = len(self.days); self.ppd = len(self.times); self.n_slots = self.n_days * self.ppd
+        self.regular_periods = min(regular_periods, self.ppd)   # คาบปกติ = period < regular_periods, ที่เหลือ = คาบเย็น
+        self.full = (1 << self.n_slots) - 1
+        self.day_index = {d: i for i, d in enumerate(self.days)}
+        self.slot_day = np.arange(self.n_slots) // self.ppd; self.slot_period = np.arange(self.n_slots) % self.ppd
+
+        # ช่องตายตัว: (วัน, คาบ) -> ชนิด (ซ้ำทุกสัปดาห์ของรอบ; ทับกันให้ homeroom > activity > lunch)
+        cycle = lambda cells: [(w * n_week + d, p) for w in range(weeks) for d, p in cells if d < n_week and p < self.ppd]
+        self.kind = {}
+        for kind, cells in (('lunch', [(d, p) for d in range(n_week) for p in lunch]), ('activity', activity), ('homeroom', homeroom)):
+            for cell in cycle(cells): self.kind[cell] = kind
+        mask = lambda kind: slots_mask(self.slot(d, p) for (d, p), k in self.kind.items() if k == kind)
+        self.lunch_mask = mask('lunch'); keep = mask('homeroom') | mask('activity')
+        self.fixed_mask = self.lunch_mask | keep
+        self.rule_mask = {False: self.fixed_mask, True: keep}   # [allow_lunch]
+        # กิจกรรมต่อเนื่องกันแสดงเป็นช่องเดียว: คาบแรกของช่วง -> จำนวนคาบ
+        self.span = {}
+        for (d, p), k in sorted(self.kind.items()):
+            if k == 'activity' and self.kind.get((d, p - 1)) != 'activity':
+                n = 1
+                while self.kind.get((d, p + n)) == 'activity': n += 1
+                self.span[(d, p)] = n
+        self.key = (tuple(self.days), tuple(self.times), self.regular_periods, tuple(sorted(self.kind.items())), minutes)
+
+    @classmethod
+    def from_clock(cls, n_days=5, start='08:00', end='21:00', minutes=60, regular_until='20:00', lunch=('12:00', '13:00'),
+                   homeroom=(0, '08:00', '09:00'), activity=(2, '15:00', '17:00'), weeks=1):
+        # ตั้งค่าด้วยเวลาจริง: ช่วงพัก/โฮมรูม/กิจกรรมครอบคาบไหนบ้างคำนวณจากความยาวคาบ (ค่าเริ่มต้น = ตารางเดิม)
+        times = clock_times(start, end, minutes)
+        within = lambda a, b: [p for p, t in enumerate(times) if a <= t[:5] < b]
+        return cls(WEEK_DAYS[:n_days], times, sum(t[:5] < regular_until for t in times), within(*lunch),
+                   [(homeroom[0], p) for p in within(*homeroom[1:])], [(activity[0], p) for p in within(*activity[1:])], weeks, minutes)
+
+    def __eq__(self, other): return isinstance(other, TimeGrid) and self.key == other.key
+    def __hash__(self): return hash(self.key)
+    def __repr__(self): return f"TimeGrid{self.key!r}"   # job_key ใช้ repr -> ต้องระบุตารางได้ครบ
+
+    def slot(self, day, period): return day * self.ppd + period
+    def period_of(self, slot): return slot % self.ppd
+    def block(self, day, period): return self.kind.get((day, period))
+    def hours_to_slots(self, hours): return hours * self.slots_per_hour
+
+DEFAULT_GRID = TimeGrid()
+
+# คอลัมน์ที่ใช้ระบุว่างานเดิม "ไม่ถูกแก้ไข" (Warm Start)
+TASK_KEY_COLS = ['Teacher ID', 'Subject ID', 'Group', 'Subject Name', 'Room', 'Room Type', 'Hours']
+
+# ==========================================
+# SUBSTITUTE INDEX (teachers per subject in load order)
+# ==========================================
+class SubstituteIndex:
+    """Teachers of every subject kept sorted by current teaching load (sorted list + bisect).
+
+    move() relocates one teacher inside the lists of the subjects they teach, so a lookup is a
+    scan in load order instead of a sort. Ties keep the order given by `order` (subject-map order
+    for the deterministic run, a seeded shuffle for portfolio runs).
+    """
+    def __init__(self, subject_teachers, load, order=None):
+        self.lists = {}; self.rank = {}; self.subjects_of = {}
+        for sid, tids in subject_teachers.items():
+            tids = order(tids) if order else tids
+            for r, t in enumerate(tids): self.rank[(sid, t)] = r; self.subjects_of.setdefault(t, []).append(sid)
+            self.lists[sid] = sorted((load[t], r, t) for r, t in enumerate(tids))
+
+    def move(self, tid, old, new):
+        for sid in self.subjects_of.get(tid, ()):
+            lst = self.lists[sid]; r = self.rank[(sid, tid)]
+            del lst[bisect.bisect_left(lst, (old, r))]
+            bisect.insort(lst, (new, r, tid))
+
+    def candidates(self, sid, exclude=None, busy=None, free=0, need=0):
+        # busy(tid) -> occupancy mask; need > 0 = ตัดครูที่ว่างใน free ไม่ถึง need ช่อง (จองไม่ได้แน่นอน)
+        if need and busy is not None:
+            return [t for _, _, t in self.lists.get(sid, ()) if t != exclude and (free & ~busy(t)).bit_count() >= need]
+        return [t for _, _, t in self.lists.get(sid, ()) if t != exclude]
+
+# ==========================================
+# TASKS / BOOKINGS (integer-encoded)
+# ==========================================
+# ครู/กลุ่ม/วิชา/ห้อง ถูกแปลงเป็นเลข id ต่อเนื่องตอนสร้าง scheduler; ป้ายชื่อจริงถอดกลับตอนสร้าง DataFrame ผลลัพธ์เท่านั้น
+class Task:
+    """One register row: `row` = position in reg_df, entity fields are dense ids (room 0 = none)."""
+    __slots__ = ('row', 'tid', 'gid', 'sid', 'hours', 'room', 'fixed', 'rtype', 'reason')
+    def __init__(self, row, tid, gid, sid, hours, room, fixed, rtype):
+        self.row = row; self.tid = tid; self.gid = gid; self.sid = sid; self.hours = hours
+        self.room = room; self.fixed = fixed; self.rtype = rtype; self.reason = None
+
+class BookingStore:
+    """Bookings as parallel typed arrays (struct-of-arrays).
+
+    unbook() only clears `alive`, so booking indices held by the search/repair stay valid until compact().
+    """
+    COLS = ('task', 'start', 'dur', 'tid', 'gid', 'room', 'suffix', 'flags')   # flags: 1 = ครูแทน, 2 = คาบพิเศษ
+    SUB = 1; EXTRA = 2
+
+    def __init__(self):
+        for c in self.COLS: setattr(self, c, array('i'))
+        self.alive = bytearray()
+
+    def __len__(self): return len(self.alive)
+
+    def append(self, *values):
+        for c, v in zip(self.COLS, values): getattr(self, c).append(v)
+        self.alive.append(1)   # เติมท้ายสุด: thread อื่นอ่านได้เฉพาะแถวที่ครบทุกคอลัมน์แล้ว
+        return len(self.alive) - 1
+
+    def live(self): return [b for b, a in enumerate(self.alive) if a]
+
+    def compact(self):
+        keep = self.live()
+        for c in self.COLS:
+            col = getattr(self, c); setattr(self, c, array('i', [col[b] for b in keep]))
+        self.alive = bytearray(b'\x01' * len(keep))
+
+    def columns(self, last=None):
+        # snapshot เป็น numpy (เฉพาะแถวที่ยังจองอยู่); last = เฉพาะ last แถวท้าย (preview ระหว่างจัด)
+        n = len(self.alive); lo = 0 if last is None else max(0, n - last)
+        alive = np.frombuffer(bytes(self.alive[lo:n]), dtype=np.uint8).astype(bool)
+        return {c: np.array(getattr(self, c)[lo:n], dtype=np.int64)[alive] for c in self.COLS}
+
+# ==========================================
+# SCHEDULER ENGINE
+# ==========================================
+class CSPScheduler:
+    def __init__(self, register_df, backend='bitset', seed=None, rooms_df=None, profile=False, control=None, grid=None):
+        self.reg_df = register_df.copy()
+        self.seed = seed; self.profile = profile
+        self.grid = grid = grid or DEFAULT_GRID   # วัน/คาบ/ช่องตายตัว: ทุก slot arithmetic อ่านจากที่นี่
+        self.control = control   # SolveControl: progress / ยกเลิก / จำกัดเวลา (ใช้ตอนรันเป็น background)
+        if control: control.attach(self)
+        # seed=None = ลำดับเดิมแบบ deterministic, มี seed = สุ่มลำดับงาน/tie-break (Portfolio)
+        self.rng = random.Random(seed) if seed is not None else None
+        self.day_rank = self.rng.sample(range(grid.n_days), grid.n_days) if self.rng else list(range(grid.n_days))
+        self.reg_df['Hours'] = pd.to_numeric(self.reg_df['Credits'], errors='coerce').fillna(2).astype(int)
+        
+        # เข้ารหัส entity เป็น id (ลำดับตามที่พบในตาราง)
+        t_codes, t_labels = pd.factorize(self.reg_df['Teacher ID'], use_na_sentinel=False)
+        g_codes, g_labels = pd.factorize(self.reg_df['Group'], use_na_sentinel=False)
+        s_codes, s_labels = pd.factorize(self.reg_df['Subject ID'])
+        self.t_labels = list(t_labels); self.g_labels = list(g_labels); self.s_labels = list(s_labels)
+        self.t_index = {l: i for i, l in enumerate(self.t_labels)}
+        self.codes = {'tid': t_codes, 'gid': g_codes, 'sid': s_codes}
+        self.r_labels = [None]; self.r_index = {None: 0}; self.r_real = [False]   # ห้อง id 0 = ไม่มีห้อง
+        self.suffixes = [""]; self.suffix_index = {"": 0}
+        self.teachers = range(len(self.t_labels)); self.groups = range(len(self.g_labels))
+        occ = OCCUPANCY_BACKENDS[backend]
+        self.t_occ = occ(grid.n_slots); self.g_occ = occ(grid.n_slots); self.r_occ = occ(grid.n_slots)
+        for t in self.teachers: self.t_occ.add(t)
+        for g in self.groups: self.g_occ.add(g)
+        
+        # Fixed blocks -> precomputed masks (rule_mask[allow_lunch])
+        self.fixed_mask = grid.fixed_mask; self.rule_mask = grid.rule_mask
+        self.windows = WindowFinder(grid.n_days, grid.ppd)
+        
+        # ห้องเรียน: r_occ = ตารางรายห้อง, rooms = ดัชนีห้องว่างตามประเภท (ถ้ามีไฟล์ห้อง)
+        self.rooms = None
+        if rooms_df is not None and not rooms_df.empty:
+            self.rooms = RoomIndex(grid.n_slots, zip(map(self.room_id, rooms_df['Room']), rooms_df['Room Type']))
+            for r in self.rooms.type_of: self.r_occ.add(r)
+        
+        self.group_daily_load = np.zeros((len(self.g_labels), grid.n_days), dtype=int)
+        # ภาระเริ่มต้น = ชั่วโมงรวมตามทะเบียน (ครู/กลุ่มที่เป็นค่าว่างไม่นับ เหมือน groupby) นับเป็นจำนวนคาบของ grid
+        hours = grid.hours_to_slots(self.reg_df['Hours'].to_numpy())
+        self.teacher_load_realtime = self.id_sums(t_codes, hours, self.t_labels)
+        self.group_load = self.id_sums(g_codes, hours, self.g_labels)
+        self.subject_teachers_map = {}
+        for sid, tid in zip(s_codes.tolist(), t_codes.tolist()):
+            if sid < 0: continue
+            lst = self.subject_teachers_map.setdefault(sid, [])
+            if tid not in lst: lst.append(tid)
+        self.sub_index = SubstituteIndex(self.subject_teachers_map, self.teacher_load_realtime,
+                                         (lambda tids: self.rng.sample(tids, len(tids))) if self.rng else None)
+        
+        self.tasks = []; self.task_by_row = []
+        self.booked = BookingStore()
+        self.failed = []
+        self.task_keys = []
+        self.warm_stats = None
+        self.portfolio = None
+        self.repair_stats = None
+        self.solve_stats = None
+        self.search_stats = None
+        self.decomposition = None
+
+    # --- เข้ารหัส / ถอดรหัส entity ---
+    def room_id(self, label):
+        rid = self.r_index.get(label)
+        if rid is None:
+            rid = self.r_index[label] = len(self.r_labels); self.r_labels.append(label)
+            self.r_real.append(isinstance(label, str) and label != '-')
+        return rid
+
+    def id_sums(self, codes, hours, labels):
+        out = np.bincount(codes, weights=hours, minlength=len(labels)).astype(int)
+        out[pd.isna(np.array(labels, dtype=object))] = 0
+        return out.tolist()
+
+    def suffix_id(self, suffix):
+        sid = self.suffix_index.get(suffix)
+        if sid is None: sid = self.suffix_index[suffix] = len(self.suffixes); self.suffixes.append(suffix)
+        return sid
+
+    def task_label(self, task):
+        sid = self.s_labels[task.sid] if task.sid >= 0 else None
+        return f"{sid} / {self.t_labels[task.tid]} / {self.g_labels[task.gid]} ({task.hours / self.grid.slots_per_hour:g}h)"
+
+    def check_mask(self, tid, gid, mask, allow_lunch=False):
+        return not ((self.rule_mask[allow_lunch] | self.t_occ.get(tid) | self.g_occ.get(gid)) & mask)
+
+    def room_need(self, task):
+        # (ห้องที่กำหนดตายตัว, ประเภทห้องที่ต้องการ) -- อย่างใดอย่างหนึ่งหรือไม่มีเลย (คำนวณไว้แล้วตอน build_tasks)
+        if task is None: return None, None
+        return task.fixed or None, task.rtype
+
+    def first_start(self, starts, days_sorted, dur, rtype):
+        if rtype is None: return self.windows.first_start(starts, days_sorted)
+        for s in self.windows.iter_starts(starts, days_sorted):
+            if self.rooms.find(rtype, s, dur) is not None: return s
+        return None
+
+    def book(self, task, slots, actual_tid=None, suffix="", is_extra=False, room=None):
+        tid = task.tid if actual_tid is None else actual_tid
+        gid = task.gid
+        if room is None:
+            rtype = task.rtype
+            room = task.fixed or ((self.rooms.pick(rtype, slots) or 0) if rtype else task.room)
+        
+        start = slots[0]; dur = len(slots); mask = ((1 << dur) - 1) << start
+        self.t_occ.mark(tid, mask); self.g_occ.mark(gid, mask)
+        if self.r_real[room]:
+            self.r_occ.mark(room, mask)
+            if self.rooms is not None: self.rooms.occupy(room, slots)
+        self.group_daily_load[gid][start // self.grid.ppd] += dur
+        self.add_load(tid, dur)
+        flags = (BookingStore.SUB if tid != task.tid else 0) | (BookingStore.EXTRA if is_extra else 0)
+        return self.booked.append(task.row, start, dur, tid, gid, room, self.suffix_id(suffix), flags)
+
+    def entry(self, b):
+        # การจอง b ในรูปอาร์กิวเมนต์ของ book() (ใช้จองซ้ำตอน rollback / warm start)
+        st = self.booked; start = st.start[b]
+        return (self.task_by_row[st.task[b]], range(start, start + st.dur[b]), st.tid[b], self.suffixes[st.suffix[b]],
+                bool(st.flags[b] & BookingStore.EXTRA), st.room[b])
+
+    def unbook(self, b):
+        # ยกเลิกการจอง b (ปิด alive ไว้ก่อน แล้ว compact() ทีหลัง เพื่อให้ index อื่นไม่เลื่อน)
+        entry = self.entry(b); st = self.booked
+        slots = entry[1]; tid, gid, room = st.tid[b], st.gid[b], st.room[b]
+        mask = ((1 << len(slots)) - 1) << slots[0]
+        self.t_occ.release(tid, mask); self.g_occ.release(gid, mask)
+        if self.r_real[room]:
+            self.r_occ.release(room, mask)
+            if self.rooms is not None: self.rooms.release(room, slots)
+        self.group_daily_load[gid][slots[0] // self.grid.ppd] -= len(slots)
+        self.add_load(tid, -len(slots))
+        st.alive[b] = 0
+        return entry
+
+    def compact(self):
+        self.booked.compact()
+
+    def apply_constraints(self):
+        self.t_occ.set_base(self.fixed_mask); self.g_occ.set_base(self.fixed_mask)
+
+    def add_load(self, tid, hours):
+        old = self.teacher_load_realtime[tid]; self.teacher_load_realtime[tid] = old + hours
+        self.sub_index.move(tid, old, old + hours)
+
+    def find_substitute(self, subject_id, original_tid, free=0, need=0):
+        # ครูวิชาเดียวกันเรียงภาระน้อยไปมาก; ระบุ free/need = เฉพาะครูที่ว่างใน free อย่างน้อย need ช่อง
+        return self.sub_index.candidates(subject_id, original_tid, self.t_occ.get, free, need)
+
+    def substitute_free(self, task, allow_lunch=False):
+        # ช่องที่กลุ่ม (และห้องที่ระบุ) ว่าง: ครูแทนต้องว่างในนี้ >= task.hours ช่อง ไม่งั้น try_allocate ล้มแน่
+        busy = self.rule_mask[allow_lunch] | self.g_occ.get(task.gid)
+        room, _ = self.room_need(task)
+        if room: busy |= self.r_occ.get(room)
+        return ~busy & self.t_occ.full
+
+    def try_allocate(self, task, tid, gid, dur, allow_split=True, allow_lunch=False, max_period=None):
+        # max_period: None = คาบปกติของ grid, grid.ppd = รวมคาบเย็น
+        max_period = max_period or self.grid.regular_periods
+        load = self.group_daily_load[gid]
+        days_sorted = sorted(range(self.grid.n_days), key=lambda d: (load[d], self.day_rank[d]))
+        room, rtype = self.room_need(task)
+        busy = self.rule_mask[allow_lunch] | self.t_occ.get(tid) | self.g_occ.get(gid)
+        if room: busy |= self.r_occ.get(room)
+        free = ~busy & self.t_occ.full
+        wf = self.windows
+        start = self.first_start(wf.start_mask(free, dur, max_period), days_sorted, dur, rtype)
+        if start is not None: return range(start, start + dur), None
+        
+        if allow_split and dur > 2:
+            half = dur // 2; rem = dur - half
+            half_starts = wf.start_mask(free, half, max_period)
+            p1 = self.first_start(half_starts, days_sorted, half, rtype)
+            if p1 is not None:
+                # ใช้ผลการค้นหาเดิม แค่ตัด start ที่ทับครึ่งแรกออก (ไม่แตะตารางจริง)
+                rem_starts = half_starts if rem == half else wf.start_mask(free, rem, max_period)
+                p2 = self.first_start(rem_starts & ~wf.overlap_starts(p1, half, rem), days_sorted, rem, rtype)
+                if p2 is not None: return range(p1, p1 + half), range(p2, p2 + rem)
+        return None, None
+
+    def room_available(self, task, start, dur):
+        room, rtype = self.room_need(task)
+        if room: return not self.r_occ.get(room) & slots_mask(range(start, start + dur))
+        return rtype is None or self.rooms.find(rtype, start, dur) is not None
+
+    def analyze_failure(self, task):
+        tid, gid = task.tid, task.gid
+        t_free = self.t_occ.free_count(tid) if tid in self.t_occ else self.grid.n_slots
+        g_free = self.g_occ.free_count(gid)
+        if t_free < task.hours: return f"Teacher Full (Free {t_free})"
+        elif g_free < task.hours: return f"Group Full (Free {g_free})"
+        room, rtype = self.room_need(task)
+        if room and (~(self.r_occ.get(room) | self.fixed_mask) & self.r_occ.full).bit_count() < task.hours: return f"Room Full ({self.r_labels[room]})"
+        if rtype and (self.rooms.free_slots_mask(rtype) & ~self.fixed_mask).bit_count() < task.hours: return f"No Free Room ({rtype})"
+        return "Time Conflict"
+
+    def order_tasks(self, tasks):
+        t_load = self.teacher_load_realtime; g_load = self.group_load
+        if self.rng is None:
+            tasks.sort(key=lambda x: (t_load[x.tid], g_load[x.gid], x.hours), reverse=True)
+        else:
+            u = self.rng.uniform
+            keys = {id(x): (t_load[x.tid] * u(0.8, 1.2), g_load[x.gid] * u(0.8, 1.2), x.hours, self.rng.random()) for x in tasks}
+            tasks.sort(key=lambda x: keys[id(x)], reverse=True)
+        return tasks
+
+    # --- 5 ขั้นตอนต่อวิชา: แต่ละขั้นคืน True เมื่อจองสำเร็จ (allocate_task หยุดที่ขั้นแรกที่สำเร็จ) ---
+    def place_standard(self, task):
+        s1, s2 = self.try_allocate(task, task.tid, task.gid, task.hours)
+        if not (s1 or s2): return False
+        if s1 and not s2: self.book(task, s1)
+        else: self.book(task, s1, suffix=" (1)"); self.book(task, s2, suffix=" (2)")
+        return True
+
+    def place_substitute(self, task):
+        for sub_tid in self.find_substitute(task.sid, task.tid, self.substitute_free(task), task.hours):
+            s1_sub, s2_sub = self.try_allocate(task, sub_tid, task.gid, task.hours)
+            if s1_sub or s2_sub:
+                sub_suf = f" (แทน {self.t_labels[sub_tid]})"
+                if s1_sub and not s2_sub: self.book(task, s1_sub, actual_tid=sub_tid, suffix=sub_suf)
+                else: self.book(task, s1_sub, actual_tid=sub_tid, suffix=sub_suf+"(1)"); self.book(task, s2_sub, actual_tid=sub_tid, suffix=sub_suf+"(2)")
+                return True
+        return False
+
+    def place_liquid(self, task):
+        dur = task.hours
+        room, rtype = self.room_need(task)
+        free = ~(self.rule_mask[False] | self.t_occ.get(task.tid) | self.g_occ.get(task.gid) | (self.r_occ.get(room) if room else 0)) & self.t_occ.full
+        if rtype: free &= self.rooms.free_slots_mask(rtype)
+        slots_collected = [[s] for s in mask_slots(free)[:dur]]
+        if len(slots_collected) != dur: return False
+        for idx, slot in enumerate(slots_collected): self.book(task, slot, suffix=f"({idx+1}/{dur})", is_extra=True)
+        return True
+
+    def place_desperate(self, task):
+        # Lunch/Evening
+        s1, s2 = self.try_allocate(task, task.tid, task.gid, task.hours, allow_lunch=True, max_period=self.grid.ppd)
+        if not (s1 or s2): return False
+        suffix_extra = " (พิเศษ)"
+        if s1 and not s2: self.book(task, s1, suffix=suffix_extra, is_extra=True)
+        else: self.book(task, s1, suffix=suffix_extra+"(1)", is_extra=True); self.book(task, s2, suffix=suffix_extra+"(2)", is_extra=True)
+        return True
+
+    def place_ext_substitute(self, task):
+        for sub_tid in self.find_substitute(task.sid, task.tid, self.substitute_free(task, True), task.hours):
+            s1_sub, s2_sub = self.try_allocate(task, sub_tid, task.gid, task.hours, allow_lunch=True, max_period=self.grid.ppd)
+            if s1_sub or s2_sub:
+                sub_suf = f" (แทน {self.t_labels[sub_tid]} พิเศษ)"
+                if s1_sub and not s2_sub: self.book(task, s1_sub, actual_tid=sub_tid, suffix=sub_suf, is_extra=True)
+                else: self.book(task, s1_sub, actual_tid=sub_tid, suffix=sub_suf+"(1)", is_extra=True); self.book(task, s2_sub, actual_tid=sub_tid, suffix=sub_suf+"(2)", is_extra=True)
+                return True
+        return False
+
+    def phases(self):
+        return (('standard', self.place_standard), ('substitute', self.place_substitute), ('liquid_fill', self.place_liquid),
+                ('desperate', self.place_desperate), ('ext_substitute', self.place_ext_substitute))
+
+    def fail_task(self, task):
+        task.reason = self.analyze_failure(task)
+        self.failed.append(task)
+
+    def allocate_task(self, task):
+        for name, place in self.phases():
+            if place(task): return True
+        self.fail_task(task)
+        return False
+
+    def allocate_all(self, tasks):
+        # ไม่มี profile/control = วนเรียก allocate_task ตรงๆ ไม่มี overhead
+        ctl = self.control
+        if not self.profile and ctl is None:
+            for task in tasks: self.allocate_task(task)
+            return
+        prof = SolverProfiler() if self.profile else None
+        if prof: prof.attach(self)
+        try:
+            if ctl: ctl.begin(len(tasks))
+            for i, task in enumerate(tasks):
+                if ctl and ctl.should_stop():
+                    # หยุดกลางทาง: งานที่เหลือนับเป็นตกหล่น ผลที่จัดไปแล้วใช้ต่อได้ (partial result)
+                    for rest in tasks[i:]: rest.reason = f"Not Scheduled ({ctl.stopped})"; self.failed.append(rest)
+                    break
+                if prof: ok = prof.allocate(self, task)
+                elif ctl: ok = self.allocate_observed(task, ctl)
+                else: ok = self.allocate_task(task)
+                if ctl: ctl.step(ok)
+        finally:
+            if prof: prof.detach(self); self.solve_stats = prof
+
+    def allocate_observed(self, task, ctl):
+        for name, place in self.phases():
+            ctl.phase = name
+            if place(task): return True
+        self.fail_task(task)
+        return False
+
+    def schedule(self):
+        # จัดตารางโดยไม่สร้าง DataFrame ผลลัพธ์ (portfolio/decompose ใช้แค่ score หรือการจอง)
+        self.apply_constraints()
+        self.tasks = self.order_tasks(self.build_tasks())
+        self.allocate_all(self.tasks)
+
+    def solve(self):
+        self.schedule()
+        return self.results()
+
+    # --- ผลลัพธ์: ถอดรหัส id กลับเป็นป้ายชื่อ (ครั้งเดียวตอนสร้าง DataFrame) ---
+    def result_frame(self, last=None):
+        c = self.booked.columns(last)
+        if not len(c['start']): return pd.DataFrame()
+        g = self.grid; period = g.slot_period[c['start']]
+        names = np.array(self.subject_names(), dtype=object)[c['task']] + np.array(self.suffixes, dtype=object)[c['suffix']]
+        return pd.DataFrame({
+            'Day': np.array(g.days, dtype=object)[g.slot_day[c['start']]], 'Period': period, 'Time': np.array(g.times, dtype=object)[period],
+            'Subject Name': names,
+            'Teacher ID': np.array(self.t_labels, dtype=object)[c['tid']], 'Group': np.array(self.g_labels, dtype=object)[c['gid']],
+            'Room': np.array(self.r_labels, dtype=object)[c['room']],
+            'Duration': c['dur'],
+            'IsSub': (c['flags'] & BookingStore.SUB) != 0, 'IsExtra': (c['flags'] & BookingStore.EXTRA) != 0})
+
+    def subject_names(self):
+        if 'Subject Name' not in self.reg_df.columns: return ['?'] * len(self.reg_df)
+        return [str(x) for x in self.reg_df['Subject Name'].tolist()]
+
+    def failed_records(self):
+        # แถวทะเบียนเดิมของงานที่ตกหล่น + Reason
+        if not self.failed: return []
+        cols = list(self.reg_df.columns)
+        rows = self.reg_df.iloc[[t.row for t in self.failed]].itertuples(index=False, name=None)
+        return [dict(zip(cols, row), Reason=t.reason) for row, t in zip(rows, self.failed)]
+
+    def results(self):
+        return self.result_frame(), self.failed_records()
+
+    # --- Warm Start: จัดใหม่เฉพาะงานที่ถูกแก้ไข ---
+    def build_tasks(self):
+        df = self.reg_df; cols = list(df.columns); n = len(df)
+        raw = df['Room'].tolist() if 'Room' in cols else ['-'] * n
+        rtypes = df['Room Type'].tolist() if 'Room Type' in cols else [None] * n
+        room_of = {}
+        tasks = []
+        for row, (tid, gid, sid, hours, room, rtype) in enumerate(zip(self.codes['tid'].tolist(), self.codes['gid'].tolist(), self.codes['sid'].tolist(),
+                                                                       self.grid.hours_to_slots(df['Hours']).tolist(), raw, rtypes)):
+            rid = room_of.get(room)
+            if rid is None: rid = room_of[room] = self.room_id(room)
+            fixed = rid if isinstance(room, str) and room.strip() not in ('-', '') else 0
+            if fixed or self.rooms is None or not (isinstance(rtype, str) and rtype in self.rooms.members): rtype = None
+            tasks.append(Task(row, tid, gid, sid, hours, rid, fixed, rtype))
+        self.task_by_row = list(tasks)
+        self.task_keys = list(zip(*[df[c].astype(str).tolist() if c in cols else [''] * n for c in TASK_KEY_COLS]))
+        return tasks
+
+    def replay_ok(self, task, slots, tid, room):
+        if tid != task.tid and tid not in self.subject_teachers_map.get(task.sid, ()): return False
+        fixed, rtype = self.room_need(task)
+        if fixed and room != fixed: return False
+        if rtype and (room not in self.rooms or self.rooms.type_of[room] != rtype): return False
+        mask = slots_mask(slots)
+        if self.r_real[room] and self.r_occ.get(room) & mask: return False
+        return self.check_mask(tid, task.gid, mask, allow_lunch=True)
+
+    def solve_incremental(self, prev):
+        self.apply_constraints()
+        tasks = self.build_tasks()
+        # จับคู่แถวใหม่กับงานเดิมที่เนื้อหาเหมือนกัน (multiset ตาม TASK_KEY_COLS); เปลี่ยน grid = ช่องเดิมใช้ไม่ได้ จัดใหม่ทั้งหมด
+        pool = {}
+        for t in (prev.tasks if prev.grid == self.grid else ()): pool.setdefault(prev.task_keys[t.row], []).append(t)
+        carried = {}
+        for t in tasks:
+            same = pool.get(self.task_keys[t.row])
+            if same: carried[id(same.pop())] = t
+        
+        # เล่นการจองเดิมซ้ำตามลำดับเดิม (แปลง id ของ scheduler เดิมผ่านป้ายชื่อ) ถ้าชนหรือครูแทนไม่มีสิทธิ์สอนแล้ว -> ปล่อยทั้งงานไปจัดใหม่
+        history = {}
+        for b in prev.booked.live():
+            ptask, slots, ptid, suffix, is_extra, proom = prev.entry(b)
+            if id(ptask) in carried:
+                history.setdefault(id(ptask), []).append((slots, self.t_index.get(prev.t_labels[ptid], -1), suffix, is_extra, self.room_id(prev.r_labels[proom])))
+        kept = set()
+        for pid, entries in history.items():
+            task = carried[pid]
+            if all(self.replay_ok(task, slots, tid, room) for slots, tid, _, _, room in entries):
+                for slots, tid, suffix, is_extra, room in entries: self.book(task, slots, tid, suffix, is_extra, room)
+                kept.add(id(task))
+        
+        todo = self.order_tasks([t for t in tasks if id(t) not in kept])
+        self.allocate_all(todo)
+        self.tasks = [t for t in tasks if id(t) in kept] + todo
+        self.warm_stats = {'tasks': len(tasks), 'kept': len(kept), 'resolved': len(todo)}
+        return self.results()
+
+    def repair(self, time_limit=2.0, seed=0):
+        # Local search หลัง solve(): ย้ายงานที่จองแล้วเพื่อให้งานตกหล่น/คาบพิเศษได้ช่องปกติ
+        if self.control: self.control.stage = 'repair'
+        search = LocalSearchRepair(self, seed=seed)
+        self.repair_stats = search.run(time_limit)
+        self.compact()
+        return self.results()
+
+    def score(self):
+        # ยิ่งน้อยยิ่งดี: (วิชาตกหล่น, คาบแทน/พิเศษ, ความต่างภาระรายวันของกลุ่ม)
+        st = self.booked
+        fallback = sum(1 for a, f in zip(st.alive, st.flags) if a and f)
+        load = self.group_daily_load
+        spread = int((load.max(axis=1) - load.min(axis=1)).sum()) if len(load) else 0
+        return (len(self.failed), fallback, spread)
+
+    def __getstate__(self):
+        state = self.__dict__.copy(); state['control'] = None   # Event/Lock ส่งข้าม process ไม่ได้
+        return state
+
+# ==========================================
+# BACKTRACKING ENGINE (MRV + forward checking)
+# ==========================================
+class BacktrackingScheduler(CSPScheduler):
+    """Same interface as CSPScheduler; regular-hours placement is a bounded search instead of one greedy pass.
+
+    Every task keeps a bitset domain of feasible start slots (own teacher, no lunch/evening).
+    The task with the fewest starts goes first (MRV); booking it recomputes the domains of the
+    tasks that share its teacher, group, fixed room or room type (forward checking) and a start that empties
+    one of them is rejected. A dead end backjumps to the latest booked neighbour and tries its
+    next start, within max_backtracks; time_limit bounds the whole search. Tasks whose teacher, group,
+    fixed room or room type is over capacity are placed greedily before the search, which then works
+    around them. Tasks the search gives up on (or never reaches) go through the greedy phases
+    (substitute / split / liquid / lunch-evening) as before. A plain greedy pass runs on a copy first
+    (under the same control) and wins if its score is better, so the result is never worse than CSPScheduler's.
+    """
+    def __init__(self, register_df, time_limit=10.0, max_backtracks=20000, max_jump=4, **kw):
+        super().__init__(register_df, **kw)
+        self.time_limit = time_limit; self.max_backtracks = max_backtracks; self.max_jump = max_jump
+
+    def allocate_all(self, tasks):
+        # greedy บนสำเนา (ใช้ Task / reg_df ร่วมกัน) เก็บไว้เทียบ: ผลค้นหาแย่กว่า -> ใช้ผล greedy แทน
+        # สำเนาใช้ control เดียวกัน (deepcopy ตัด control ทิ้ง): ยกเลิก/หมดเวลาหยุดรอบ greedy ด้วย และนับ progress รวม
+        ctl = self.control
+        twin = copy.deepcopy(self, {id(self.reg_df): self.reg_df, **{id(t): t for t in self.task_by_row}})
+        twin.control = ctl
+        if ctl: ctl.attach(twin)
+        CSPScheduler.allocate_all(twin, tasks)
+        if ctl: ctl.attach(self)
+        greedy_failed = [(t, t.reason) for t in twin.failed]
+        rest = self.search(tasks)
+        self.compact()   # search ถอนการจองกลางทาง (ช่อง None) -> บีบก่อนให้ขั้น greedy ต่อท้าย
+        super().allocate_all(rest)
+        stats = self.search_stats; greedy_kept = twin.score() < self.score()
+        if greedy_kept: self.__dict__.update(twin.__dict__); self.control = ctl
+        # Task ใช้ร่วมกัน: สาเหตุตกหล่นต้องมาจากรอบที่ชนะเท่านั้น (งานที่อีกรอบจัดได้ -> ล้างสาเหตุ)
+        failed = greedy_failed if greedy_kept else [(t, t.reason) for t in self.failed]
+        for t in tasks: t.reason = None
+        for t, reason in failed: t.reason = reason
+        self.search_stats = dict(stats, greedy_kept=int(greedy_kept))
+
+    def occ_of(self, key):
+        return (self.t_occ if key[0] == 'T' else self.g_occ if key[0] == 'G' else self.r_occ).get(key[1])
+
+    def search(self, tasks):
+        t0 = time.perf_counter(); ctl = self.control; wf = self.windows
+        full = self.t_occ.full; rule = self.rule_mask[False]
+        # ความจุคาบปกติของครู/กลุ่ม/ห้องตายตัว/ประเภทห้อง: ความต้องการเกินจุ = ยังไงก็มีงานหลุด ค้นหาไม่ช่วย -> งานที่ใช้ทรัพยากรนั้นใช้ greedy
+        usable = full & ~rule
+        def uses(t):
+            room, rtype = self.room_need(t)
+            return [('T', t.tid), ('G', t.gid)] + ([('R', room)] if room else []) + ([('Y', rtype)] if rtype else [])
+        def capacity(k):
+            return self.rooms.capacity(k[1], usable) if k[0] == 'Y' else (usable & ~self.occ_of(k)).bit_count()
+        demand = {}
+        for t in tasks:
+            if t.hours > 0:
+                for k in uses(t): demand[k] = demand.get(k, 0) + t.hours
+        over = {k for k, h in demand.items() if h > capacity(k)}
+        # งานบนทรัพยากรที่เกินจุจัดแบบ greedy ก่อน (ได้เลือกช่องก่อน) แล้วค้นหาที่เหลือรอบๆ งานเหล่านั้น
+        first = [t for t in tasks if t.hours > 0 and any(k in over for k in uses(t))]
+        if first: CSPScheduler.allocate_all(self, first)
+        todo = [t for t in tasks if t.hours > 0 and not any(k in over for k in uses(t))]
+        n = len(todo); need = [self.room_need(t) for t in todo]
+        rank = {id(t): r for r, t in enumerate(tasks)}
+        nbr = {}   # ('T', ครู) / ('G', กลุ่ม) / ('R', ห้องตายตัว) / ('Y', ประเภทห้อง) -> งานที่ใช้ทรัพยากรนั้น
+        keys = [uses(t) for t in todo]
+        for i, ks in enumerate(keys):
+            for k in ks: nbr.setdefault(k, []).append(i)
+        rfree = {}
+        if self.rooms is not None:
+            for rtype in {r for _, r in need if r}: rfree[rtype] = self.rooms.free_slots_mask(rtype)
+
+        def domain(i):
+            t = todo[i]; room, rtype = need[i]
+            busy = rule | self.t_occ.get(t.tid) | self.g_occ.get(t.gid)
+            if room: busy |= self.r_occ.get(room)
+            free = ~busy & full
+            if rtype: free &= rfree[rtype]
+            return wf.start_mask(free, t.hours, self.grid.regular_periods)
+
+        dom = [domain(i) for i in range(n)]; state = [0] * n   # 0 = รอจัด, 1 = จองแล้ว, 2 = ค้นไม่สำเร็จ
+        booked = [None] * n; ver = [0] * n; heap = []
+        def push(i):
+            ver[i] += 1; heapq.heappush(heap, (dom[i].bit_count(), -todo[i].hours, rank[id(todo[i])], i, ver[i]))
+        for i in range(n): push(i)
+
+        def refresh(i, ok=True):
+            # forward checking: คำนวณโดเมนของงานข้างเคียงที่ยังไม่จัดใหม่ (คืน False ถ้ามีงานไหนไม่เหลือช่อง)
+            for k in keys[i]:
+                for j in nbr[k]:
+                    if state[j] or j == i: continue
+                    d = domain(j)
+                    if d != dom[j]: dom[j] = d; push(j)
+                    if not d: ok = False
+            return ok
+
+        def assign(i, start):
+            t = todo[i]; rtype = need[i][1]
+            b = self.book(t, range(start, start + t.hours))
+            if rtype: rfree[rtype] = self.rooms.free_slots_mask(rtype)
+            booked[i] = b; state[i] = 1
+            if refresh(i): return True
+            unassign(i); return False
+
+        def unassign(i):
+            self.unbook(booked[i]); booked[i] = None; state[i] = 0
+            rtype = need[i][1]
+            if rtype: rfree[rtype] = self.rooms.free_slots_mask(rtype)
+            refresh(i); dom[i] = domain(i); push(i)
+
+        def values(i):
+            # ลำดับค่าเหมือน greedy: วันที่กลุ่มยังเรียนน้อยก่อน แล้วคาบเช้าก่อน
+            load = self.group_daily_load[todo[i].gid]
+            return list(wf.iter_starts(dom[i], sorted(range(self.grid.n_days), key=lambda d: (load[d], self.day_rank[d]))))
+
+        stack = []
+        def extend(i, vals, pos):
+            d = domain(i); rtype = need[i][1]; dur = todo[i].hours
+            for k in range(pos, len(vals)):
+                s = vals[k]
+                if not (d >> s) & 1 or (rtype and self.rooms.find(rtype, s, dur) is None): continue
+                if assign(i, s):
+                    stack.append((i, vals, k + 1))
+                    if ctl: ctl.step(True)
+                    return True
+            return False
+
+        def undo_frame():
+            j, vals, pos = stack.pop(); unassign(j)
+            if ctl: ctl.done -= 1; ctl.placed -= 1
+            return j, vals, pos
+
+        backtracks = dead_ends = 0
+        if ctl: ctl.begin(n, 'search'); ctl.phase = 'backtrack'
+        while heap:
+            if (ctl and ctl.should_stop()) or time.perf_counter() - t0 > self.time_limit: break   # ที่เหลือไป greedy
+            _, _, _, i, v = heapq.heappop(heap)
+            if state[i] or v != ver[i]: continue
+            d = domain(i)
+            if d != dom[i]: dom[i] = d; push(i); continue   # โดเมนเปลี่ยนจากห้องตามประเภท -> จัดลำดับใหม่
+            if d and extend(i, values(i), 0): continue
+            # ทางตัน: ถอยกลับไปงานข้างเคียงล่าสุดที่จองไว้ แล้วลองช่องถัดไปของงานนั้น
+            dead_ends += 1; resolved = False; jumps = 0
+            conflict = {j for k in keys[i] for j in nbr[k] if state[j] == 1}
+            while stack and conflict and jumps < self.max_jump and backtracks < self.max_backtracks and time.perf_counter() - t0 < self.time_limit:
+                j, vals, pos = undo_frame(); backtracks += 1
+                if j not in conflict: continue   # งานที่ไม่เกี่ยวกลับเข้าคิว จะถูกจัดใหม่ภายหลัง
+                jumps += 1; conflict.discard(j)
+                if extend(j, vals, pos): resolved = True; break
+                conflict |= {m for k in keys[j] for m in nbr[k] if state[m] == 1}
+            if resolved: push(i)
+            else:
+                state[i] = 2
+                if ctl: ctl.total -= 1
+        placed = state.count(1); elapsed = time.perf_counter() - t0
+        self.search_stats = {'tasks': n, 'placed': placed, 'gave_up': state.count(2), 'dead_ends': dead_ends,
+                             'backtracks': backtracks, 'timed_out': int(elapsed > self.time_limit), 'elapsed': round(elapsed, 3)}
+        if ctl: ctl.total -= n - placed - state.count(2); ctl.phase = None
+        done = {id(todo[i]) for i in range(n) if state[i] == 1} | {id(t) for t in first}   # first: จัดแล้ว (หรือตกหล่นแล้ว)
+        return [t for t in tasks if id(t) not in done]
+
+ENGINES = {'greedy': CSPScheduler, 'backtrack': BacktrackingScheduler}
+
+# ==========================================
+# BACKGROUND SOLVE (progress / cancel / time limit)
+# ==========================================
+CONTROL_POLL_S = 0.25   # รอผลจาก process อื่น: ตรวจยกเลิก/หมดเวลาทุกเท่านี้วินาที
+
+class SolveControl:
+    """Shared between the UI and a running solve: progress counters, cooperative cancel and a time limit.
+
+    The solver checks should_stop() between tasks (and between local-search moves), so a stop
+    takes effect within one task's allocation time and leaves a consistent partial schedule.
+    A child control (own time limit, e.g. a portfolio budget) forwards progress to its parent
+    and also stops when the parent does.
+    """
+    def __init__(self, time_limit=None, parent=None):
+        self.time_limit = time_limit; self._cancel = threading.Event(); self.parent = parent
+        self.started = time.perf_counter(); self.stopped = None; self.source = None   # source = scheduler ที่กำลังจัด
+        self.total = 0; self.done = 0; self.placed = 0; self.failed = 0; self.phase = None; self.stage = None
+
+    def cancel(self): self._cancel.set()
+
+    def attach(self, sch):
+        self.source = sch
+        if self.parent: self.parent.attach(sch)
+
+    def begin(self, total, stage='allocate'):
+        self.total += total; self.stage = stage
+        if self.parent: self.parent.begin(total, stage)
+
+    def should_stop(self):
+        if self.stopped is None:
+            if self._cancel.is_set(): self.stopped = 'cancelled'
+            elif self.time_limit and time.perf_counter() - self.started > self.time_limit: self.stopped = 'time limit'
+            elif self.parent and self.parent.should_stop(): self.stopped = self.parent.stopped
+        return self.stopped is not None
+
+    def step(self, ok):
+        self.done += 1
+        if ok: self.placed += 1
+        else: self.failed += 1
+        if self.parent: self.parent.step(ok)
+
+    def progress(self):
+        return {'done': self.done, 'total': self.total, 'placed': self.placed, 'failed': self.failed, 'phase': self.phase,
+                'stage': self.stage, 'elapsed': round(time.perf_counter() - self.started, 2), 'stopped': self.stopped,
+                'fraction': self.done / self.total if self.total else 0.0}
+
+    def partial(self, last=None):
+        # การจองล่าสุดของ scheduler ที่กำลังจัด (เรียกจาก thread ของ solver เอง เช่นตอน sync)
+        return pd.DataFrame() if self.source is None else self.source.result_frame(last)
+
+# ==========================================
+# SOLVER PROFILER (per-phase instrumentation)
+# ==========================================
+class SolverProfiler:
+    """Wall time, attempts and placements per allocation phase, call counters and slowest tasks of one solve.
+
+    Counters wrap try_allocate and the feasibility tests it runs (WindowFinder.start_mask windows,
+    RoomIndex.find typed-room checks) on the scheduler's own instances only while attached,
+    so an unprofiled scheduler runs the plain methods.
+    """
+    COUNTED = ('try_allocate', 'windows.start_mask', 'rooms.find')
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.phases = {}; self.calls = dict.fromkeys(self.COUNTED, 0)
+        self.failed = {'tasks': 0, 'time_s': 0.0}; self.tasks = 0; self.total_s = 0.0
+        self.slowest = []      # (seconds, label, phase) top_n ช้าที่สุด
+
+    @staticmethod
+    def owner(sch, path):
+        # 'windows.start_mask' -> (sch.windows, 'start_mask'); ไม่มี rooms = None
+        *objs, name = path.split('.')
+        for o in objs: sch = getattr(sch, o, None)
+        return sch, name
+
+    def attach(self, sch):
+        for path in self.COUNTED:
+            obj, name = self.owner(sch, path)
+            if obj is None: continue
+            fn = getattr(obj, name)
+            def counted(*a, _fn=fn, _path=path, **kw):
+                self.calls[_path] += 1; return _fn(*a, **kw)
+            setattr(obj, name, counted)
+
+    def detach(self, sch):
+        for path in self.COUNTED:
+            obj, name = self.owner(sch, path)
+            if obj is not None: obj.__dict__.pop(name, None)
+
+    def allocate(self, sch, task):
+        t_task = time.perf_counter(); placed_by = None
+        for name, place in sch.phases():
+            if sch.control: sch.control.phase = name
+            t = time.perf_counter(); ok = place(task); dt = time.perf_counter() - t
+            p = self.phases.setdefault(name, {'attempts': 0, 'placed': 0, 'time_s': 0.0})
+            p['attempts'] += 1; p['time_s'] += dt
+            if ok: p['placed'] += 1; placed_by = name; break
+        if placed_by is None:
+            t = time.perf_counter(); sch.fail_task(task)
+            self.failed['tasks'] += 1; self.failed['time_s'] += time.perf_counter() - t
+        dt = time.perf_counter() - t_task; self.tasks += 1; self.total_s += dt
+        if len(self.slowest) < self.top_n or dt > self.slowest[-1][0]:
+            label = sch.task_label(task)
+            self.slowest.append((dt, label, placed_by or 'failed'))
+            self.slowest.sort(key=lambda x: -x[0]); del self.slowest[self.top_n:]
+        return placed_by is not None
+
+    def to_dict(self):
+        phases = {name: {'attempts': p['attempts'], 'placed': p['placed'], 'time_s': round(p['time_s'], 4),
+                         'share': round(p['time_s'] / self.total_s, 3) if self.total_s else 0.0}
+                  for name, p in self.phases.items()}
+        return {'tasks': self.tasks, 'total_s': round(self.total_s, 4), 'phases': phases,
+                'failed': {'tasks': self.failed['tasks'], 'time_s': round(self.failed['time_s'], 4)}, 'calls': dict(self.calls),
+                'slowest': [{'task': label, 'phase': phase, 'ms': round(dt * 1000, 3)} for dt, label, phase in self.slowest]}
+
+    def to_json(self, path=None):
+        text = json.dumps(self.to_dict(), ensure_ascii=False, indent=1)
+        if path:
+            with open(path, 'w', encoding='utf-8') as f: f.write(text)
+        return text
+
+# ==========================================
+# LOCAL SEARCH REPAIR (Ejection Chain)
+# ==========================================
+class LocalSearchRepair:
+    """Time-bounded ejection-chain search over a solved CSPScheduler.
+
+    Objective (lexicographic, lower is better) = CSPScheduler.score(): failed tasks,
+    substitute/extra bookings, spread of group daily load. Every move only touches
+    the slots of the tasks it moves, so moves are evaluated incrementally.
+    """
+    def __init__(self, sch, seed=0, max_eject=2):
+        self.sch = sch; self.rng = random.Random(seed); self.max_eject = max_eject
+        self.owner = {}        # ('T'|'G', id, slot) -> booking index
+        self.task_books = {}   # id(task) -> [booking index]
+        self.tasks = {}        # id(task) -> task
+        self.fb_tasks = {}     # งานที่มีคาบแทน/พิเศษ
+        self.unplaced = {id(t): t for t in sch.failed}
+        self.fallback = 0
+        self.spread = {g: int(l.max() - l.min()) for g, l in enumerate(sch.group_daily_load)}
+        self.spread_total = sum(self.spread.values())
+        for b in sch.booked.live(): self._index(b)
+        for t in self.tasks.values(): self._refresh(t)
+
+    def objective(self): return (len(self.unplaced), self.fallback, self.spread_total)
+
+    def _is_fallback(self, b):
+        return self.sch.booked.flags[b] != 0
+
+    def _index(self, b):
+        st = self.sch.booked; task = self.sch.task_by_row[st.task[b]]; tid, gid = st.tid[b], st.gid[b]
+        for s in range(st.start[b], st.start[b] + st.dur[b]): self.owner[('T', tid, s)] = b; self.owner[('G', gid, s)] = b
+        self.task_books.setdefault(id(task), []).append(b); self.tasks[id(task)] = task
+        if self._is_fallback(b): self.fallback += 1
+
+    def _refresh(self, task):
+        if any(self._is_fallback(b) for b in self.task_books.get(id(task), [])): self.fb_tasks[id(task)] = task
+        else: self.fb_tasks.pop(id(task), None)
+
+    def _update_spread(self, gid):
+        l = self.sch.group_daily_load[gid]; new = int(l.max() - l.min())
+        self.spread_total += new - self.spread[gid]; self.spread[gid] = new
+
+    def _book(self, task, slots, actual_tid=None, suffix="", is_extra=False, room=None):
+        b = self.sch.book(task, slots, actual_tid, suffix, is_extra, room)
+        self._index(b); self._update_spread(task.gid)
+        return b
+
+    def _unbook_task(self, task):
+        entries = []
+        for b in self.task_books.pop(id(task), []):
+            st = self.sch.booked; tid, gid = st.tid[b], st.gid[b]
+            for s in range(st.start[b], st.start[b] + st.dur[b]):
+                del self.owner[('T', tid, s)]; del self.owner[('G', gid, s)]
+            if self._is_fallback(b): self.fallback -= 1
+            entries.append(self.sch.unbook(b))
+        self._update_spread(task.gid)
+        return entries
+
+    def _place_regular(self, task):
+        # เหมือนขั้น Standard ของ allocate_task: ครูตัวจริง ไม่ใช้คาบพัก/เย็น
+        s1, s2 = self.sch.try_allocate(task, task.tid, task.gid, task.hours)
+        if not (s1 or s2): return False
+        if s1 and not s2: self._book(task, s1)
+        else: self._book(task, s1, suffix=" (1)"); self._book(task, s2, suffix=" (2)")
+        return True
+
+    def _eject_window(self, task):
+        # สุ่มหน้าต่างที่ไม่ชนช่องตายตัว แล้วดูว่าใครขวางอยู่ (ต้องไม่เกิน max_eject งาน)
+        sch = self.sch; tid, gid, dur = task.tid, task.gid, task.hours
+        starts = list(sch.windows.iter_starts(sch.windows.start_mask(sch.t_occ.full & ~sch.rule_mask[False], dur, sch.grid.regular_periods), range(sch.grid.n_days)))
+        if not starts: return None, []
+        start = self.rng.choice(starts); blockers = {}
+        for s in range(start, start + dur):
+            for key in (('T', tid, s), ('G', gid, s)):
+                b = self.owner.get(key)
+                if b is not None:
+                    bt = sch.task_by_row[sch.booked.task[b]]; blockers[id(bt)] = bt
+        if id(task) in blockers or len(blockers) > self.max_eject: return None, []
+        return start, list(blockers.values())
+
+    def relocate(self, task, allow_eject):
+        before = self.objective(); was_unplaced = id(task) in self.unplaced
+        old = self._unbook_task(task); ejected = []; placed = self._place_regular(task)
+        if not placed and allow_eject and task.hours > 0:
+            start, blockers = self._eject_window(task)
+            if start is not None:
+                ejected = [(bt, self._unbook_task(bt)) for bt in blockers]
+                placed = self.sch.room_available(task, start, task.hours)
+                if placed: self._book(task, range(start, start + task.hours))
+                for bt, _ in ejected:
+                    if not placed: break
+                    if not self._place_regular(bt): placed = False
+        if placed:
+            self.unplaced.pop(id(task), None)
+            if self.objective() <= before:
+                if was_unplaced: task.reason = None
+                for t in [task] + [bt for bt, _ in ejected]: self._refresh(t)
+                return True
+        # rollback: ถอนของใหม่ทั้งหมด แล้วจองของเดิมกลับตามเดิม
+        for t in [task] + [bt for bt, _ in ejected]: self._unbook_task(t)
+        for entry in old: self._book(*entry)
+        for bt, entries in ejected:
+            for entry in entries: self._book(*entry)
+        if was_unplaced: self.unplaced[id(task)] = task
+        return False
+
+    def pick(self):
+        r = self.rng.random()
+        if self.unplaced and r < 0.5: return self.rng.choice(list(self.unplaced.values())), True
+        if self.fb_tasks and r < 0.8: return self.rng.choice(list(self.fb_tasks.values())), True
+        # Balance: ย้ายงานของกลุ่มที่ภาระรายวันต่างกันมาก (try_allocate เลือกวันที่เบาก่อนอยู่แล้ว)
+        heavy = [g for g, sp in self.spread.items() if sp >= 2]
+        if not heavy: return None, False
+        gid = self.rng.choice(heavy)
+        books = [b for s in mask_slots(self.sch.g_occ.get(gid) & ~self.sch.rule_mask[True]) if (b := self.owner.get(('G', gid, s))) is not None]
+        if not books: return None, False
+        return self.sch.task_by_row[self.sch.booked.task[self.rng.choice(books)]], False
+
+    def run(self, time_limit):
+        t0 = time.perf_counter(); best = self.objective()
+        curve = [(0.0, best)]; moves = accepted = 0
+        ctl = self.sch.control
+        while time.perf_counter() - t0 < time_limit and best != (0, 0, 0):
+            if ctl and ctl.should_stop(): break
+            task, allow_eject = self.pick()
+            if task is None: break
+            moves += 1
+            if self.relocate(task, allow_eject): accepted += 1
+            if self.objective() < best: best = self.objective(); curve.append((round(time.perf_counter() - t0, 4), best))
+        elapsed = time.perf_counter() - t0
+        self.sch.failed = [t for t in self.sch.failed if id(t) in self.unplaced]
+        return {'curve': curve, 'moves': moves, 'accepted': accepted, 'elapsed': round(elapsed, 3),
+                'moves_per_s': round(moves / elapsed, 1) if elapsed else 0.0}
+
+# ==========================================
+# PORTFOLIO (Parallel Multi-Start)
+# ==========================================
+def _portfolio_run(register_df, seed, backend, rooms_df=None, profile=False, engine='greedy', grid=None, control=None):
+    sch = ENGINES[engine](register_df, backend=backend, seed=seed, rooms_df=rooms_df, profile=profile, grid=grid, control=control); sch.schedule()
+    sch.control = None
+    return sch
+
+def solve_portfolio(register_df, n_runs=8, workers=None, time_budget=None, base_seed=0, backend='bitset', rooms_df=None, profile=False, engine='greedy', grid=None, control=None):
+    # รอบแรกใช้ลำดับปกติ (seed=None) เสมอ ผลจึงไม่แย่กว่า solve() เดิม; รันใน process นี้ภายใน time_budget
+    # ส่วนรอบสุ่มรันใน pool -> มีผลให้คืนเสมอ (หมดเวลา = ผลบางส่วน งานที่เหลือตกหล่น)
+    # control: progress/ยกเลิกของรอบแรกส่งถึง control, ระหว่างรอรอบอื่นตรวจยกเลิกทุก CONTROL_POLL_S
+    seeds = [base_seed + i for i in range(1, n_runs)]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(seeds)))
+    t0 = time.perf_counter(); left = lambda: None if time_budget is None else time_budget - (time.perf_counter() - t0)
+    # multiprocessing.Pool: หมดเวลา/ได้ตารางสมบูรณ์แล้ว terminate() ฆ่ารอบที่ยังรันอยู่ได้จริง ไม่ปล่อยให้กิน CPU ต่อ
+    results = queue.SimpleQueue(); pool = mp.Pool(workers) if seeds else None
+    # worker ที่ตายกลางทาง (segfault / OOM kill) ไม่มี callback: รอบของมันหายไป -> นับ process ที่ตายแล้วเลิกรอรอบเหล่านั้น
+    # (เก็บก่อนส่งงาน: pool สร้าง worker ใหม่แทนตัวที่ตายและเอาตัวเก่าออกจาก _pool)
+    procs = list(pool._pool) if pool else []
+    try:
+        for s in seeds: pool.apply_async(_portfolio_run, (register_df, s, backend, rooms_df, profile, engine, grid), callback=results.put, error_callback=results.put)
+        own = control if time_budget is None else SolveControl(time_budget, parent=control)
+        best = _portfolio_run(register_df, None, backend, rooms_df, profile, engine, grid, own)
+        scores = {None: best.score()}; pending = len(seeds)
+        if control: control.stage = 'portfolio'
+        while pending and best.score()[:2] != (0, 0):   # ตารางสมบูรณ์ ไม่ต้องรอรอบที่เหลือ
+            wait = left()
+            if (wait is not None and wait <= 0) or (control and control.should_stop()): break
+            procs += [p for p in pool._pool if p not in procs]
+            if pending <= sum(p.exitcode is not None for p in procs): break
+            try: sch = results.get(timeout=CONTROL_POLL_S if wait is None else min(wait, CONTROL_POLL_S))
+            except queue.Empty: continue
+            pending -= 1
+            if isinstance(sch, BaseException): raise sch
+            scores[sch.seed] = sch.score()
+            if sch.score() < best.score(): best = sch
+    finally:
+        if pool: pool.terminate(); pool.join()
+    best.portfolio = {'best_seed': best.seed, 'score': best.score(), 'scores': scores, 'runs_done': len(scores)}
+    return best
+
+# ==========================================
+# COMPONENT DECOMPOSITION (independent sub-problems in parallel)
+# ==========================================
+# ครู/กลุ่ม/วิชา (ครูแทน)/ห้อง ที่ไม่มีทางแย่งช่องเวลากันเลย = ปัญหาย่อยอิสระ: จัดแยกกันพร้อมกันได้แล้วรวมผล
+# ลำดับงาน ภาระ ครูแทน และห้องตามประเภท คิดภายในส่วนของตัวเองอยู่แล้ว -> แต่ละส่วนได้ผลเหมือนจัดทั้งก้อน (greedy, seed=None)
+def components(register_df, rooms_df=None):
+    # union-find: แถว = เส้นเชื่อม ครู-กลุ่ม, ครู-วิชา (ครูวิชาเดียวกันแทนกันได้), ครู-ห้องตายตัว / ประเภทห้อง
+    n = len(register_df); cols = register_df.columns
+    t_codes, t_labels = pd.factorize(register_df['Teacher ID'], use_na_sentinel=False)
+    g_codes, g_labels = pd.factorize(register_df['Group'], use_na_sentinel=False)
+    s_codes, s_labels = pd.factorize(register_df['Subject ID'])
+    off_g = len(t_labels); off_s = off_g + len(g_labels)
+    parent = list(range(off_s + len(s_labels))); extra = {}
+    def node(key):
+        if key not in extra: extra[key] = len(parent); parent.append(len(parent))
+        return extra[key]
+    def find(x):
+        while parent[x] != x: parent[x] = parent[parent[x]]; x = parent[x]
+        return x
+    def union(a, b):
+        a = find(a); b = find(b)
+        if a != b: parent[b] = a
+    typed = set()
+    if rooms_df is not None and not rooms_df.empty:
+        # ห้องในไฟล์ห้องถูกหยิบให้งานที่ระบุแค่ประเภท -> ห้องตายตัวกับประเภทของมันเป็นทรัพยากรเดียวกัน
+        for room, rtype in zip(rooms_df['Room'], rooms_df['Room Type']): union(node(('RT', rtype)), node(('R', room)))
+        typed = {r for r in rooms_df['Room Type'] if isinstance(r, str)}
+    rooms = register_df['Room'].tolist() if 'Room' in cols else ['-'] * n
+    rtypes = register_df['Room Type'].tolist() if 'Room Type' in cols else [None] * n
+    for t, g, sid, room, rtype in zip(t_codes.tolist(), g_codes.tolist(), s_codes.tolist(), rooms, rtypes):
+        union(t, off_g + g)
+        if sid >= 0: union(t, off_s + sid)
+        fixed = isinstance(room, str) and room.strip() not in ('-', '')
+        if not fixed and rtype in typed: union(t, node(('RT', rtype)))
+        elif isinstance(room, str) and room != '-': union(t, node(('R', room)))
+    parts = {}
+    for row, t in enumerate(t_codes.tolist()): parts.setdefault(find(t), []).append(row)
+    return list(parts.values())
+
+def _component_run(frames, engine, backend, seed, grid=None):
+    # จัดหลายส่วนใน worker เดียว; ส่งกลับเฉพาะการจอง (id ภายในส่วน + ป้ายห้อง) และงานที่ตกหล่น ไม่สร้าง DataFrame ผลลัพธ์
+    out = []
+    for df, rooms_df in frames:
+        sch = ENGINES[engine](df, backend=backend, seed=seed, rooms_df=rooms_df, grid=grid)
+        sch.apply_constraints(); sch.allocate_all(sch.order_tasks(sch.build_tasks()))
+        c = sch.booked.columns()
+        out.append(({k: c[k] for k in ('task', 'start', 'dur', 'tid', 'flags')}, [sch.r_labels[r] for r in c['room'].tolist()],
+                    [sch.suffixes[x] for x in c['suffix'].tolist()], [(t.row, t.reason) for t in sch.failed], sch.search_stats))
+    return out
+
+def _component_rooms(df, rooms_df):
+    # เฉพาะห้องของประเภทที่ส่วนนี้ใช้ (ลำดับเดิม -> ห้องที่ถูกหยิบเหมือนเดิม)
+    if rooms_df is None or rooms_df.empty: return rooms_df
+    type_of = dict(zip(rooms_df['Room'], rooms_df['Room Type']))
+    used = set(df['Room Type']) if 'Room Type' in df.columns else set()
+    if 'Room' in df.columns: used |= {type_of[r] for r in df['Room'] if r in type_of}
+    return rooms_df[rooms_df['Room Type'].isin(used)]
+
+def solve_decomposed(register_df, rooms_df=None, workers=None, engine='greedy', backend='bitset', seed=None, grid=None, control=None):
+    # control: นับ progress ทีละก้อนที่เสร็จ, ระหว่างรอตรวจยกเลิก/หมดเวลา -> ก้อนที่ยังไม่เสร็จนับเป็นตกหล่น
+    parts = components(register_df, rooms_df)
+    workers = min(workers or os.cpu_count() or 1, len(parts))
+    sch = ENGINES[engine](register_df, backend=backend, seed=seed, rooms_df=rooms_df, grid=grid, control=control)
+    info = {'components': len(parts), 'largest': max(map(len, parts), default=0), 'workers': workers}
+    if workers <= 1:
+        # ส่วนเดียว หรือมี CPU เดียว: แยกไม่ได้เร็วขึ้น จัดทั้งก้อนตามปกติ (ผลเท่ากันอยู่แล้ว)
+        sch.schedule(); sch.decomposition = info; return sch
+    # แบ่งส่วนเป็นก้อนละ worker: ส่วนใหญ่ก่อน ใส่ก้อนที่งานรวมน้อยที่สุด (LPT)
+    chunks = [[] for _ in range(workers)]; size = [0] * workers
+    for rows in sorted(parts, key=len, reverse=True):
+        k = size.index(min(size)); chunks[k].append(rows); size[k] += len(rows)
+    jobs = [(rows_list, [register_df.iloc[rows] for rows in rows_list]) for rows_list in chunks]
+    if control: control.begin(len(register_df), 'decompose')
+    finished = queue.SimpleQueue(); solved = [None] * len(jobs); pending = len(jobs)
+    pool = mp.Pool(workers)
+    try:
+        for k, (_, frames) in enumerate(jobs):
+            pool.apply_async(_component_run, ([(df, _component_rooms(df, rooms_df)) for df in frames], engine, backend, seed, grid),
+                             callback=lambda r, k=k: finished.put((k, r)), error_callback=finished.put)
+        while pending and not (control and control.should_stop()):
+            try: got = finished.get(timeout=CONTROL_POLL_S if control else None)
+            except queue.Empty: continue
+            if isinstance(got, BaseException): raise got
+            k, solved[k] = got; pending -= 1
+            if control:
+                n = sum(map(len, jobs[k][0])); nf = sum(len(r[3]) for r in solved[k])
+                control.done += n; control.placed += n - nf; control.failed += nf
+    finally:
+        pool.terminate(); pool.join()
+
+    # รวมผล: จองซ้ำใน scheduler ทั้งก้อนตามลำดับงานรวม (ผลลัพธ์/ตกหล่น/score เรียงเหมือนจัดทั้งก้อน)
+    sch.apply_constraints(); sch.tasks = sch.order_tasks(sch.build_tasks())
+    rank = np.empty(len(sch.tasks), dtype=np.int64); rank[[t.row for t in sch.tasks]] = np.arange(len(sch.tasks))
+    t_global = np.asarray(sch.codes['tid']); entries = []; failed = []; search = {}
+    for (rows_list, frames), results in zip(jobs, solved):
+        if results is None:
+            # หยุดก่อนก้อนนี้เสร็จ: งานทั้งก้อนนับเป็นตกหล่น (เหมือน allocate_all ที่หยุดกลางทาง)
+            for row in (r for rows in rows_list for r in rows):
+                task = sch.task_by_row[row]; task.reason = f"Not Scheduled ({control.stopped})"; failed.append(task)
+            continue
+        for rows, df, (c, rooms, suffixes, fails, stats) in zip(rows_list, frames, results):
+            rows = np.asarray(rows)
+            local = pd.factorize(df['Teacher ID'], use_na_sentinel=False)[0]
+            to_global = np.empty(local.max() + 1, dtype=np.int64); to_global[local] = t_global[rows]
+            g_rows = rows[c['task']]; tids = to_global[c['tid']]
+            for b, (row, start, dur, tid, flags) in enumerate(zip(g_rows.tolist(), c['start'].tolist(), c['dur'].tolist(), tids.tolist(), c['flags'].tolist())):
+                entries.append((rank[row], b, row, start, dur, tid, suffixes[b], flags, rooms[b]))
+            for lrow, reason in fails:
+                task = sch.task_by_row[rows[lrow]]; task.reason = reason; failed.append(task)
+            for k, v in (stats or {}).items(): search[k] = search.get(k, 0) + v
+    entries.sort(key=lambda e: (e[0], e[1]))
+    for _, _, row, start, dur, tid, suffix, flags, room in entries:
+        task = sch.task_by_row[row]
+        rid = sch.room_id(room) if isinstance(room, str) else 0 if room is None else task.room
+        sch.book(task, range(start, start + dur), tid, suffix, bool(flags & BookingStore.EXTRA), rid)
+    sch.failed = sorted(failed, key=lambda t: rank[t.row])
+    if search: sch.search_stats = dict(search, elapsed=round(search['elapsed'], 3))
+    sch.decomposition = dict(info, chunks=[len(ch) for ch in chunks])
+    return sch
+
@@ -0,0 +1,60 @@
+import os
+import sys
+from collections import Counter
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gen_data
+from benchmark import assign_rooms
+from ingest import load_dir
+from scheduler import DEFAULT_GRID
+
+# ข้อมูลทดสอบสร้างด้วย gen_data seed ตายตัว: ไฟล์เหมือนเดิมทุกไบต์ทุกครั้ง ผลการจัดจึงเทียบกันได้ตรงๆ
+SEED = 7; SCALE = 0.25
+
+def _dataset(tmp_path_factory, name, **kw):
+    d = tmp_path_factory.mktemp(name)
+    gen_data.generate(str(d), seed=SEED, scale=SCALE, verbose=False, **kw)
+    return load_dir(str(d))
+
+@pytest.fixture(scope='session')
+def school(tmp_path_factory):
+    return _dataset(tmp_path_factory, 'school')
+
+@pytest.fixture(scope='session')
+def departmental(tmp_path_factory):
+    # แผนกแยกกัน -> หลายส่วนอิสระ (decompose)
+    return _dataset(tmp_path_factory, 'dept', departmental=True)
+
+@pytest.fixture(scope='session')
+def crowded(school):
+    # ยุบเหลือ 10 กลุ่ม: ชนกันมาก ผ่านทุกขั้น (ครูแทน / liquid / คาบพิเศษ / ตกหล่น)
+    df, rooms = school; df = df.copy()
+    df['Group'] = ['G%d' % (i % 10) for i in range(len(df))]
+    return df, rooms
+
+@pytest.fixture(scope='session')
+def roomed(school):
+    # ห้องตายตัวแย่งกัน + งานที่ระบุแค่ประเภทห้อง
+    df, rooms = school
+    return assign_rooms(df, rooms), rooms
+
+def booked_cells(res, grid=DEFAULT_GRID):
+    # ผลลัพธ์ -> [(แถว, slot)] ทีละคาบที่ถูกจอง
+    start = res['Day'].map(grid.day_index).to_numpy() * grid.ppd + res['Period'].to_numpy()
+    return [(i, s) for i, (s0, dur) in enumerate(zip(start.tolist(), res['Duration'].tolist())) for s in range(s0, s0 + dur)]
+
+def double_bookings(res, grid=DEFAULT_GRID):
+    # (คอลัมน์, ค่า, slot) ที่ถูกจองซ้ำ: ครู / กลุ่ม / ห้องจริง ('-' = ไม่ระบุห้อง)
+    cells = booked_cells(res, grid); out = []
+    for col in ('Teacher ID', 'Group', 'Room'):
+        vals = res[col].tolist()
+        seen = Counter((vals[i], s) for i, s in cells if col != 'Room' or (isinstance(vals[i], str) and vals[i].strip() not in ('-', '')))
+        out += [(col, v, s) for (v, s), n in seen.items() if n > 1]
+    return out
+
+def blocked_bookings(res, grid=DEFAULT_GRID):
+    # [(แถว, slot)] ที่ผิดกฎช่องตายตัว: homeroom/กิจกรรมห้ามทุกขั้น, คาบปกติ (ไม่ใช่คาบพิเศษ) ห้ามพักเที่ยง/คาบเย็น
+    keep, lunch = grid.rule_mask[True], grid.lunch_mask; extra = res['IsExtra'].tolist()
+    return [(i, s) for i, s in booked_cells(res, grid)
+            if keep >> s & 1 or not extra[i] and (lunch >> s & 1 or grid.period_of(s) >= grid.regular_periods)]
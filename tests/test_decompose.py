@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+import gen_data
+from conftest import SEED, SCALE
+from ingest import load_dir
+from jobs import solve_job
+from scheduler import CSPScheduler, SolveControl, components, solve_decomposed
+
+def assert_same_solve(a, b):
+    pd.testing.assert_frame_equal(a[0], b[0])
+    pd.testing.assert_frame_equal(pd.DataFrame(a[1]), pd.DataFrame(b[1]))
+
+def test_departments_are_independent_components(departmental):
+    df, rooms = departmental
+    parts = components(df, rooms)
+    assert len(parts) > 1 and sorted(r for p in parts for r in p) == list(range(len(df)))
+
+def test_decomposed_uses_several_workers_and_matches_monolithic(departmental):
+    df, rooms = departmental
+    sch = solve_decomposed(df, rooms_df=rooms, workers=2)
+    assert sch.decomposition['workers'] == 2
+    assert len(sch.decomposition['chunks']) == 2 and min(sch.decomposition['chunks']) > 0
+    assert_same_solve(sch.results(), CSPScheduler(df, rooms_df=rooms).solve())
+
+def test_solve_job_decompose_runs_in_parallel(departmental):
+    # เส้นทางเดียวกับปุ่มในแอป (decompose = จำนวน process ย่อย, อย่างน้อย 2)
+    df, rooms = departmental
+    sch, res, failed = solve_job(SolveControl(), df, rooms, None, None, 0, False, 'greedy', 2)
+    assert sch.decomposition['workers'] == 2 and sch.control is None
+    assert_same_solve((res, failed), CSPScheduler(df, rooms_df=rooms).solve())
+
+def test_cancelled_decompose_returns_unscheduled(departmental):
+    df, rooms = departmental
+    ctl = SolveControl(); ctl.cancel()
+    res, failed = solve_decomposed(df, rooms_df=rooms, workers=2, control=ctl).results()
+    assert res.empty and len(failed) == len(df)
+    assert {f['Reason'] for f in failed} == {'Not Scheduled (cancelled)'}
+
+@pytest.mark.parametrize('departmental', [False, True])
+def test_fast_generator_honours_departmental(tmp_path, departmental):
+    # generate_fast --departmental ต้องแยกแผนกได้เหมือน generate() (ไม่ใช่เงียบแล้วได้ข้อมูลรวมแผนก)
+    gen_data.generate_fast(str(tmp_path), seed=SEED, scale=SCALE, verbose=False, departmental=departmental)
+    df, rooms = load_dir(str(tmp_path))
+    assert (len(components(df, rooms)) > 1) == departmental
@@ -0,0 +1,33 @@
+import pytest
+from conftest import blocked_bookings, double_bookings
+from scheduler import ENGINES, TimeGrid
+
+# คาบปกติจบเที่ยง -> ต้องใช้คาบพิเศษ (พักเที่ยง/คาบเย็น) เยอะ
+GRIDS = {'6-day': TimeGrid.from_clock(6),
+         '30min-2wk-short': TimeGrid.from_clock(minutes=30, regular_until='12:00', weeks=2),
+         '7-day-15min-2wk': TimeGrid.from_clock(7, minutes=15, weeks=2)}
+
+def make(engine, df, rooms, **kw):
+    # backtrack ตัดเวลาสั้น: ผลที่ถูกตัดกลางทางก็ต้องไม่ผิดกฎ
+    if engine == 'backtrack': kw['time_limit'] = 1.0
+    return ENGINES[engine](df, rooms_df=rooms, **kw)
+
+@pytest.mark.parametrize('grid', list(GRIDS))
+@pytest.mark.parametrize('engine', list(ENGINES))
+@pytest.mark.parametrize('data', ['school', 'crowded'])
+def test_no_blocked_cells(request, data, engine, grid):
+    df, rooms = request.getfixturevalue(data); grid = GRIDS[grid]
+    res, _ = make(engine, df, rooms, grid=grid).solve()
+    assert not res.empty and set(res['Day']) <= set(grid.days)
+    assert (res['Period'] + res['Duration'] <= grid.ppd).all()
+    assert blocked_bookings(res, grid) == []
+    assert double_bookings(res, grid) == []
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_warm_start_onto_new_grid(crowded, engine):
+    # ตารางเวลาเปลี่ยน -> ช่องเดิมใช้ไม่ได้ ต้องจัดใหม่ทั้งหมดบน grid ใหม่
+    df, rooms = crowded; grid = GRIDS['30min-2wk-short']
+    prev = make(engine, df, rooms); prev.solve()
+    sch = make(engine, df, rooms, grid=grid); res, _ = sch.solve_incremental(prev)
+    assert sch.warm_stats['kept'] == 0
+    assert blocked_bookings(res, grid) == [] and double_bookings(res, grid) == []
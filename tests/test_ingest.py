@@ -0,0 +1,45 @@
+import pandas as pd
+import gen_data
+import ingest
+from conftest import SEED, SCALE
+from ingest import SmartDataManager, load_dir
+
+def process(path, **kw):
+    with open(path, 'rb') as f: return SmartDataManager().process_file(f, **kw)
+
+def write(d, name, text): (d / name).write_text(text)
+
+def test_excel_matches_csv_with_title_rows(tmp_path):
+    # หัวรายงาน 2 บรรทัดก่อน header, รหัสครูเป็นตัวเลข (ต้องได้ str), คอลัมน์ไม่มีชื่อ
+    rows = [['ตารางสอน ภาคเรียนที่ 1', None, None, None], [None, None, None, None],
+            ['teacher_id', 'subject_id', 'หน่วยกิต', None],
+            [101, 'S-01', 3, 'a'], [102, 'S-02', 2, None], [101, 'S-03', 1, 'c']]
+    pd.DataFrame(rows).to_excel(tmp_path / 'teach.xlsx', index=False, header=False)
+    pd.DataFrame(rows).to_csv(tmp_path / 'teach.csv', index=False, header=False)
+    xl = process(tmp_path / 'teach.xlsx')
+    assert list(xl.columns) == ['Teacher ID', 'Subject ID', 'Credits', 'Unnamed: 3']
+    assert xl['Teacher ID'].tolist() == ['101', '102', '101'] and xl['Credits'].tolist() == [3, 2, 1]
+    pd.testing.assert_frame_equal(xl, process(tmp_path / 'teach.csv'))
+    pd.testing.assert_frame_equal(process(tmp_path / 'teach.xlsx', manual_header=2), xl)
+
+def test_relational_merge_round_robin(tmp_path):
+    # ทะเบียน (วิชา, กลุ่ม) x ครูที่สอนวิชานั้น: กลุ่มที่ i ของวิชาได้ครูคนที่ i mod n (ตามลำดับแถวใน teach)
+    # แถวซ้ำนับครั้งเดียว, วิชาที่ไม่มีครูถูกตัด, ครูที่วิชาไม่มีกลุ่มลงได้ NoGroup
+    write(tmp_path, 'teach.csv', 'teacher_id,subject_id\nT1,S1\nT2,S1\nT3,S2\nT4,S9\nT1,S1\n')
+    write(tmp_path, 'register.csv', 'group,subject_id\nG1,S1\nG2,S1\nG3,S1\nG1,S2\nG2,S3\nG1,S1\n')
+    write(tmp_path, 'subject.csv', 'subject_id,subject_name,credits\nS1,Math,3\nS2,Sci,2\nS3,Art,1\nS9,Music,1\n')
+    df, _ = load_dir(str(tmp_path))
+    got = [tuple(map(str, r)) for r in df[['Teacher ID', 'Subject ID', 'Group', 'Subject Name']].itertuples(index=False, name=None)]
+    assert got == [('T1', 'S1', 'G1', 'Math'), ('T1', 'S1', 'G3', 'Math'), ('T2', 'S1', 'G2', 'Math'),
+                   ('T3', 'S2', 'G1', 'Sci'), ('T4', 'S9', 'NoGroup_0', 'Music')]
+    assert df['Credits'].tolist() == [3, 3, 3, 2, 1] and (df['Room'] == '-').all()
+
+def test_chunked_csv_matches_single_read(tmp_path, monkeypatch):
+    # บังคับทุกไฟล์เข้าทาง chunk (chunk ละ 50 แถว) -> ผล merge ต้องเหมือนอ่านทีเดียว ทั้งค่าและลำดับแถว
+    gen_data.generate(str(tmp_path), seed=SEED, scale=SCALE, verbose=False)
+    ref, ref_rooms = load_dir(str(tmp_path))
+    monkeypatch.setattr(ingest, 'CSV_CHUNK_BYTES', 0); monkeypatch.setattr(ingest, 'CSV_CHUNK_ROWS', 50)
+    df, rooms = load_dir(str(tmp_path))
+    assert len(ref) > 50
+    pd.testing.assert_frame_equal(df, ref)
+    pd.testing.assert_frame_equal(rooms, ref_rooms)
@@ -0,0 +1,87 @@
+import os
+import time
+import pytest
+import jobs
+from jobs import JobQueue, SharedControl, job_key
+
+# ฟังก์ชันงานระดับ module: worker (spawn) import ไฟล์นี้ได้
+def slow_job(ctl, n):
+    ctl.begin(n)
+    for _ in range(n):
+        if ctl.should_stop(): break
+        time.sleep(0.01); ctl.step(True)
+    return ctl.done
+
+def double_job(ctl, x): return 2 * x
+
+def pid_job(ctl): return os.getpid()
+
+def wait_for(cond, timeout=30):
+    end = time.time() + timeout
+    while not cond():
+        assert time.time() < end, "timed out"
+        time.sleep(0.05)
+
+@pytest.fixture
+def make_queue():
+    made = []
+    def make(**kw):
+        q = JobQueue(**dict({'max_workers': 1}, **kw)); made.append(q); return q
+    yield make
+    for q in made: q.shutdown()
+
+def test_identical_jobs_are_deduplicated(make_queue):
+    q = make_queue()
+    a = q.submit('u1', 'calc', double_job, 21, key=job_key('calc', 21))
+    b = q.submit('u2', 'calc', double_job, 21, key=job_key('calc', 21))
+    c = q.submit('u2', 'calc', double_job, 5, key=job_key('calc', 5))
+    assert a == b != c and q.jobs[a].owners == {'u1', 'u2'}
+    assert q.result(a) == 42 and q.result(c) == 10
+    # เสร็จแล้วก็ยังใช้ผลเดิม
+    assert q.submit('u3', 'calc', double_job, 21, key=job_key('calc', 21)) == a
+    assert q.stats()['done'] == 2
+
+def test_cancel_waits_for_last_owner(make_queue):
+    q = make_queue(); key = job_key('slow', 'x')
+    a = q.submit('u1', 'slow', slow_job, 100000, key=key); q.submit('u2', 'slow', slow_job, 100000, key=key)
+    queued = q.submit('u1', 'slow', slow_job, 10, key=job_key('slow', 'y'))
+    wait_for(lambda: q.status(a) == 'running' and q.progress(a)['done'] > 0)
+    q.cancel(queued, 'u1')
+    q.cancel(a, 'u1'); time.sleep(3 * jobs.SYNC_EVERY_S)
+    assert q.status(a) == 'running'   # u2 ยังรออยู่
+    q.cancel(a, 'u2'); wait_for(lambda: q.status(a) != 'running')
+    assert q.status(a) == 'done' and q.result(a) < 100000 and q.progress(a)['stopped'] == 'cancelled'
+    # งานที่รออยู่ (อาจถูกดึงเข้า call queue ของ pool แล้ว): ยกเลิกไม่ได้ก็ต้องหยุดทันทีที่เริ่ม
+    wait_for(lambda: q.status(queued) in ('cancelled', 'done'))
+    assert q.status(queued) == 'cancelled' or q.result(queued) == 0
+    # งานที่ถูกยกเลิกไม่นำกลับมาใช้กับคำขอใหม่
+    assert q.submit('u3', 'slow', slow_job, 1, key=key) != a
+
+def test_finished_jobs_are_evicted(make_queue):
+    q = make_queue(keep_done=2)
+    ids = []
+    for x in range(4):
+        ids.append(q.submit('u', 'calc', double_job, x, key=job_key('calc', x))); q.result(ids[-1])
+    q.submit('u', 'calc', double_job, 9, key=job_key('calc', 9))
+    gone = ids[:2]
+    assert all(j not in q.jobs and j not in q.channel for j in gone)
+    assert job_key('calc', 0) not in q.by_key and set(ids[2:]) <= set(q.jobs)
+
+def test_run_falls_back_in_process_when_full(make_queue):
+    q = make_queue(max_pending=1)
+    busy = q.submit('u1', 'slow', slow_job, 100000, key=job_key('slow'))
+    assert q.submit('u2', 'pid', pid_job, key=job_key('pid')) is None
+    assert q.run('u2', 'pid', pid_job, key=job_key('pid')) == os.getpid()
+    q.cancel(busy, 'u1'); wait_for(lambda: q.jobs[busy].future.done())
+    assert q.run('u2', 'pid', pid_job, key=job_key('pid2')) != os.getpid()
+
+def test_shared_control_syncs_progress_and_cancel(monkeypatch):
+    monkeypatch.setattr(jobs, 'SYNC_EVERY_S', 0.0)
+    channel = {}; ctl = SharedControl(channel, 'j1')
+    ctl.begin(10); ctl.step(True); ctl.step(False)
+    assert channel['j1']['total'] == 10 and channel['j1']['done'] == 2 and channel['j1']['failed'] == 1
+    assert channel[('partial', 'j1')].empty   # ยังไม่มี scheduler
+    assert not ctl.should_stop()
+    channel[('cancel', 'j1')] = True
+    assert ctl.should_stop() and ctl.stopped == 'cancelled' and channel['j1']['stopped'] is None
+    ctl.sync(); assert channel['j1']['stopped'] == 'cancelled'
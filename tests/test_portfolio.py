@@ -0,0 +1,36 @@
+import multiprocessing as mp
+import os
+import time
+import pytest
+import scheduler
+from scheduler import CSPScheduler, SolveControl, solve_portfolio
+
+def test_portfolio_picks_best_seed(crowded):
+    df, rooms = crowded
+    sch = solve_portfolio(df, n_runs=4, workers=2, rooms_df=rooms)
+    info = sch.portfolio
+    assert info['runs_done'] == 4 and set(info['scores']) == {None, 1, 2, 3}
+    assert info['score'] == min(info['scores'].values()) == sch.score()
+    assert info['scores'][info['best_seed']] == sch.score()
+
+def test_portfolio_never_worse_than_single_run(crowded):
+    df, rooms = crowded
+    single = CSPScheduler(df, rooms_df=rooms); single.solve()
+    assert solve_portfolio(df, n_runs=3, workers=2, rooms_df=rooms).score() <= single.score()
+
+_real_run = scheduler._portfolio_run
+def crashing_run(register_df, seed, *args, **kw):
+    # รอบสุ่มใน worker ตายทันที (เหมือนโดน OOM kill): ไม่มีผล ไม่มี error callback
+    if seed is not None: os._exit(1)
+    return _real_run(register_df, seed, *args, **kw)
+
+@pytest.mark.skipif(mp.get_start_method() != 'fork', reason="worker must inherit the patched run")
+@pytest.mark.parametrize('control', [None, SolveControl])
+def test_portfolio_returns_when_workers_die(crowded, monkeypatch, control):
+    # ไม่มี time_budget: ต้องไม่รอผลจาก worker ที่ตายไปแล้วตลอดกาล
+    df, rooms = crowded
+    monkeypatch.setattr(scheduler, '_portfolio_run', crashing_run)
+    t = time.perf_counter()
+    sch = solve_portfolio(df, n_runs=3, workers=2, rooms_df=rooms, control=control and control())
+    assert time.perf_counter() - t < 30
+    assert sch.portfolio['best_seed'] is None and sch.portfolio['runs_done'] == 1
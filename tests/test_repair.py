@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+from conftest import blocked_bookings, double_bookings
+from scheduler import CSPScheduler, TimeGrid
+
+def booked_slots(sch):
+    # ตำแหน่งแถวของงาน -> จำนวนช่องที่จองไว้ (รวมคาบแทน/คาบพิเศษ/ liquid ที่แตกเป็นช่องเดี่ยว)
+    c = sch.booked.columns()
+    return np.bincount(c['task'], weights=c['dur'], minlength=len(sch.reg_df)).astype(int)
+
+@pytest.mark.parametrize('grid', [None, TimeGrid.from_clock(6, minutes=30)], ids=['default', '6-day-30min'])
+@pytest.mark.parametrize('data', ['crowded', 'roomed'])
+def test_repair_keeps_timetable_valid(request, data, grid):
+    df, rooms = request.getfixturevalue(data)
+    sch = CSPScheduler(df, rooms_df=rooms, grid=grid); sch.solve()
+    before = sch.score()
+    res, failed = sch.repair(time_limit=1.0, seed=0)
+    after = sch.score(); g = sch.grid
+    assert sch.repair_stats['moves'] > 0
+    assert double_bookings(res, g) == [] and blocked_bookings(res, g) == []
+    # ทุกงานที่จัดได้มีครบชั่วโมง (task.hours = จำนวนช่องบน grid) งานตกหล่นไม่มีการจองค้าง
+    slots = booked_slots(sch); failed_rows = {t.row for t in sch.failed}
+    assert all(slots[t.row] == (0 if t.row in failed_rows else t.hours) for t in sch.tasks)
+    assert len(failed) == len(sch.failed) == after[0]
+    # ไม่เพิ่มงานตกหล่น ไม่เพิ่มคาบแทน/คาบพิเศษ และดีขึ้นจริง (ทุกชุดนี้มีทางให้ย้าย)
+    assert after[0] <= before[0] and after[1] <= before[1] and after < before
@@ -0,0 +1,40 @@
+import io
+import zipfile
+import openpyxl
+import pandas as pd
+import pytest
+from reports import ReportGenerator
+
+resource = pytest.importorskip('resource')
+
+def result_frame(n_teachers, n_groups=40, per_teacher=2):
+    n = n_teachers * per_teacher
+    return pd.DataFrame({'Day': 'Mon', 'Period': [i % 12 for i in range(n)], 'Time': '08:00-09:00', 'Subject Name': [f"S{i}" for i in range(n)],
+                         'Teacher ID': [f"T{i % n_teachers}" for i in range(n)], 'Group': [f"G{i % n_groups}" for i in range(n)],
+                         'Room': '-', 'Duration': 1, 'IsSub': False, 'IsExtra': False})
+
+def sheet_names(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as z:
+        return [n for n in z.namelist() if n.startswith('xl/worksheets/sheet')]
+
+@pytest.fixture
+def fd_limit_1024():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(1024, hard), hard))
+    yield
+    resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+def test_school_wide_excel_fits_in_fd_limit(fd_limit_1024):
+    # ชีตครู + กลุ่ม + ห้อง มากกว่า ulimit -n: constant_memory จะเปิดไฟล์ชั่วคราวค้างจนเกิน
+    df = result_frame(1100)
+    out = ReportGenerator().export_excel(df, by_group=True, by_room=True).getvalue()
+    assert len(sheet_names(out)) == 1 + 1100 + 40 + 1
+
+def test_streamed_and_in_memory_excel_match(monkeypatch):
+    df = result_frame(5, n_groups=3); rg = ReportGenerator()
+    def cells(data):
+        wb = openpyxl.load_workbook(io.BytesIO(data))
+        return {ws.title: [list(r) for r in ws.iter_rows(values_only=True)] for ws in wb}
+    streamed = rg.export_excel(df, by_group=True, grids=True).getvalue()
+    monkeypatch.setattr(ReportGenerator, 'MAX_STREAMED_SHEETS', 0)
+    assert cells(rg.export_excel(df, by_group=True, grids=True).getvalue()) == cells(streamed)
@@ -0,0 +1,104 @@
+from collections import Counter
+import pandas as pd
+import pytest
+from benchmark import BaselineScheduler
+from conftest import double_bookings
+from scheduler import ENGINES, BacktrackingScheduler, CSPScheduler, SolveControl
+
+@pytest.mark.parametrize('backend', ['bitset', 'matrix'])
+@pytest.mark.parametrize('data', ['school', 'crowded'])
+def test_greedy_matches_baseline(request, data, backend):
+    # engine แบบ id/bitset ต้องจัดได้เหมือน engine เดิม (numpy ทีละช่อง) ทุกแถว รวมสาเหตุที่ตกหล่น
+    df, _ = request.getfixturevalue(data)
+    ref, ref_failed = BaselineScheduler(df).solve()
+    res, failed = CSPScheduler(df, backend=backend).solve()
+    pd.testing.assert_frame_equal(res, ref)
+    assert [f['Reason'] for f in failed] == [f['Reason'] for f in ref_failed]
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+@pytest.mark.parametrize('data', ['crowded', 'roomed'])
+def test_no_double_booking(request, data, engine):
+    df, rooms = request.getfixturevalue(data)
+    res, failed = ENGINES[engine](df, rooms_df=rooms).solve()
+    assert double_bookings(res) == []
+    assert res['Duration'].sum() + sum(f['Credits'] for f in failed) >= df['Credits'].sum()
+
+def rows_of(sch, res, rows):
+    # แถวผลลัพธ์ของงานในตำแหน่ง rows (ตำแหน่งแถวในทะเบียน) เป็น multiset
+    task = sch.booked.columns()['task']
+    return Counter(tuple(r) for r, t in zip(res.itertuples(index=False, name=None), task.tolist()) if t in rows)
+
+@pytest.mark.parametrize('engine', list(ENGINES))
+def test_warm_start_keeps_unchanged_bookings(roomed, engine):
+    df, rooms = roomed
+    prev = ENGINES[engine](df, rooms_df=rooms); prev_res, _ = prev.solve()
+    # แก้ 5 แถว (หน่วยกิต 1 <-> 2), ลบ 3 แถว, เพิ่มกลุ่มใหม่ 4 แถว
+    edited = df.copy(); changed = [3, 40, 77, 120, 200]
+    edited.loc[edited.index[changed], 'Credits'] = ((df['Credits'].iloc[changed] == 1) + 1).astype(df['Credits'].dtype).to_numpy()
+    edited = edited.drop(edited.index[[10, 11, 150]])
+    added = df.iloc[[5, 6, 7, 8]].copy(); added['Group'] = 'GNEW'
+    edited = pd.concat([edited, added], ignore_index=True)
+    sch = ENGINES[engine](edited, rooms_df=rooms); res, failed = sch.solve_incremental(prev)
+
+    unchanged = set(range(len(df))) - set(changed) - {10, 11, 150}
+    assert sch.warm_stats['kept'] == len(unchanged)
+    assert sch.warm_stats['resolved'] == len(changed) + len(added)
+    # การจองของงานที่ไม่ถูกแก้อยู่ที่เดิมทุกคาบ (เทียบทั้งแถว: วัน คาบ ครู กลุ่ม ห้อง ครูแทน/คาบพิเศษ)
+    kept = rows_of(prev, prev_res, unchanged)
+    assert not kept - Counter(tuple(r) for r in res.itertuples(index=False, name=None))
+    assert double_bookings(res) == []
+    assert len(res['Group'].eq('GNEW').to_numpy().nonzero()[0]) + sum(f['Group'] == 'GNEW' for f in failed) > 0
+
+class StopAfter(SolveControl):
+    # ยกเลิกหลังจัดครบ n งาน (จำลองผู้ใช้กดยกเลิกกลางทาง)
+    def __init__(self, n): super().__init__(); self.n = n
+    def step(self, ok):
+        super().step(ok)
+        if self.done >= self.n: self.cancel()
+
+def test_backtrack_greedy_pass_obeys_control(crowded):
+    # รอบ greedy บนสำเนาต้องหยุดตาม control และนับ progress: ผลที่ได้ = สิ่งที่ progress รายงาน
+    df, rooms = crowded; ctl = StopAfter(50)
+    res, failed = BacktrackingScheduler(df, rooms_df=rooms, control=ctl).solve()
+    assert ctl.stopped == 'cancelled' and ctl.done == 50
+    assert len(df) - len(failed) == ctl.placed and res['Subject Name'].size > 0
+    assert ctl.total > len(df)   # รวมรอบ greedy + ค้นหา
+
+@pytest.mark.parametrize('data', ['crowded', 'roomed'])
+def test_backtrack_reasons_come_from_the_kept_result(request, data):
+    df, rooms = request.getfixturevalue(data)
+    sch = BacktrackingScheduler(df, rooms_df=rooms); sch.solve()
+    assert {id(t) for t in sch.tasks if t.reason} == {id(t) for t in sch.failed}
+
+def test_backtrack_with_typed_rooms_finishes_and_never_loses(roomed):
+    # ห้องตายตัวเกินจุ/ประเภทห้อง: ค้นหาต้องไม่กินเวลาจนหมด time_limit และไม่แย่กว่า greedy
+    df, rooms = roomed
+    greedy = CSPScheduler(df, rooms_df=rooms); greedy.solve()
+    sch = BacktrackingScheduler(df, rooms_df=rooms); sch.solve()
+    assert sch.search_stats['timed_out'] == 0 and sch.score() <= greedy.score()
+
+@pytest.mark.parametrize('data', ['crowded', 'roomed'])
+def test_profiler_counts_every_task_once(request, data):
+    # ทุกงานจบที่เฟสเดียว (placed) หรือตกหล่น: ผลรวมต้องเท่าจำนวนงาน และผลจัดต้องเหมือนไม่ profile
+    df, rooms = request.getfixturevalue(data)
+    plain = CSPScheduler(df, rooms_df=rooms); ref, _ = plain.solve()
+    sch = CSPScheduler(df, rooms_df=rooms, profile=True); res, failed = sch.solve()
+    stats = sch.solve_stats.to_dict()
+    assert stats['tasks'] == len(sch.tasks)
+    assert sum(p['placed'] for p in stats['phases'].values()) + stats['failed']['tasks'] == len(sch.tasks)
+    assert stats['failed']['tasks'] == len(sch.failed) == len(failed)
+    assert stats['phases']['standard']['attempts'] == len(sch.tasks) and stats['calls']['try_allocate'] > 0
+    pd.testing.assert_frame_equal(res, ref)
+    # ถอด wrapper ออกหลังจัดเสร็จ
+    assert 'start_mask' not in vars(sch.windows) and 'try_allocate' not in vars(sch)
+
+def test_profiler_off_adds_nothing(crowded, monkeypatch):
+    # profile=False ต้องไม่สร้าง profiler และไม่ห่อ method ใดๆ
+    import scheduler
+    def boom(*a, **kw): raise AssertionError('profiler created with profile=False')
+    monkeypatch.setattr(scheduler, 'SolverProfiler', boom)
+    df, rooms = crowded
+    for ctl in (None, SolveControl()):
+        sch = CSPScheduler(df, rooms_df=rooms, control=ctl); sch.solve()
+        assert sch.solve_stats is None
+        assert 'start_mask' not in vars(sch.windows) and 'try_allocate' not in vars(sch)